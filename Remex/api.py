@@ -0,0 +1,102 @@
+"""Library API of Remex, for programs which run it in-process instead of through the console.
+The functions take images, the bytes of image files or binary file objects, and return images, or the bytes of the output files when an image format is given.
+They never print, ask anything nor stop the interpreter: they raise a RemexError instead. They keep no state, so several threads can call them at the same time."""
+import io, xml.etree.ElementTree
+from PIL import Image as ImagePIL
+from main import (RemexError, InvalidImageError, InvalidSizeError, InvalidMapError, UnsupportedFormatError, ImageFormatExtensions, AutotileExpander, MapAutotiler, TilesetGenerator, RuleMaker,
+        checkIndexedImage, checkChipsetSize, checkAutotileSize, extractChipsetTiles, listChipsetTiles, expandAutotileImage, expandAutotileImages)
+from main import makeMinitileAtlas as makeMinitileAtlasImage
+
+def openImage(source, subject="The image"):
+    """Returns the image of <source>: an image, the bytes of an image file or a binary file object. The pixels are decoded at once."""
+    if isinstance(source, ImagePIL.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        image = ImagePIL.open(source)
+        image.load()
+    except (OSError, ValueError) as error:
+        raise InvalidImageError("{0} is not a valid image. Details:\n{1}".format(subject, error))
+    return image
+
+def encodeImage(image, imageFormat="png"):
+    """Returns the bytes of the file of <image> in <imageFormat>: "png", or "raw" for the raw format of rawimage."""
+    if imageFormat == "raw":
+        from rawimage import makeRawImage
+        return makeRawImage(image)
+    elif imageFormat == "png":
+        outputFile = io.BytesIO()
+        image.save(outputFile, "PNG")
+        return outputFile.getvalue()
+    raise UnsupportedFormatError("The image format \"{0}\" is not supported. The formats are {1}.".format(imageFormat, ", ".join(ImageFormatExtensions)))
+
+def _encodeOutput(image, imageFormat):
+    return image if imageFormat is None else encodeImage(image, imageFormat)
+
+def _openAutotile(autotile, indexed):
+    imageAutotile = openImage(autotile, "The autotile")
+    if indexed is True:
+        checkIndexedImage(imageAutotile, "The autotile")
+    checkAutotileSize(imageAutotile)
+    return imageAutotile
+
+def extractChipset(chipset, keyColors=[], keyTolerance=0, indexed=False, imageFormat=None):
+    """Returns the groups of tiles of <chipset>, by the suffix of their files in the extract command: "w0", "an", "at0"... "lo", "hi".
+    The colors of <keyColors>, (r, g, b) tuples, are transparent in the deco tiles, as well as the colors within <keyTolerance> of them.
+    With <indexed>, the chipset must be an indexed image and the tiles keep its palette."""
+    imageChipset = openImage(chipset, "The chipset")
+    if indexed is True:
+        checkIndexedImage(imageChipset, "The chipset")
+    checkChipsetSize(imageChipset)
+    extractedTiles = listChipsetTiles(*extractChipsetTiles(imageChipset, keyColors, keyTolerance, indexed))
+    return dict([(suffix.lstrip("_"), _encodeOutput(tile, imageFormat)) for description, suffix, tile in extractedTiles])
+
+def expandAutotile(autotile, indexed=False, imageFormat=None):
+    """Returns the expanded autotile of <autotile>. With <indexed>, the autotile must be an indexed image and the expanded autotile keeps its palette."""
+    return _encodeOutput(expandAutotileImage(_openAutotile(autotile, indexed), indexed), imageFormat)
+
+def expandAutotiles(autotiles, indexed=False, imageFormat=None):
+    """Returns the expanded autotiles of the list <autotiles>, all expanded at once. With <indexed>, the autotiles must share the same palette."""
+    expandedAutotiles = expandAutotileImages([_openAutotile(autotile, indexed) for autotile in autotiles], indexed)
+    return [_encodeOutput(expandedAutotile, imageFormat) for expandedAutotile in expandedAutotiles]
+
+def makeMinitileAtlas(autotile, atlasColumns=8, indexed=False, imageFormat=None):
+    """Returns the minitile atlas of <autotile>, its composition and its binary composition index. See the minitiles format of the expand command."""
+    atlas, composition = makeMinitileAtlasImage(_openAutotile(autotile, indexed), atlasColumns, indexed)
+    return _encodeOutput(atlas, imageFormat), composition, AutotileExpander("autotile", ".png").makeMinitileIndex(composition, atlasColumns)
+
+def _writeDocument(xmlData):
+    outputFile = io.StringIO()
+    xmlData.writexml(outputFile, addindent="  ", newl="\n", encoding="UTF-8")
+    return outputFile.getvalue().encode()
+
+def _parseXML(source, description):
+    if isinstance(source, (bytes, bytearray, memoryview, str)):
+        source = io.BytesIO(source.encode() if isinstance(source, str) else source)
+    try:
+        return xml.etree.ElementTree.parse(source)
+    except xml.etree.ElementTree.ParseError as error:
+        raise InvalidMapError("The {0} is not a valid XML document. Details:\n{1}".format(description, error))
+
+def makeTileset(imageSource, tilesetName="Tileset", wangSet=False):
+    """Returns the bytes of the tsx tileset of the expanded autotile whose path in the tileset is <imageSource>. With <wangSet>, the tileset also has a Wang set."""
+    return _writeDocument(TilesetGenerator("expanded autotile", ".tsx").makeXML(imageSource, tilesetName, wangSet))
+
+def makeRule(tileset, mapLayer="Tile Layer 1", version08=False):
+    """Returns the bytes of the automapping rule made with <tileset>, the text or bytes of a tsx file, or a binary file object, for the map layer <mapLayer>."""
+    tilesetXML = _parseXML(tileset, "tileset").getroot()
+    if tilesetXML.tag != "tileset":
+        raise InvalidMapError("The tileset is not a tileset for Tiled.")
+    ruleMaker = RuleMaker("automapping rule", ".tmx")
+    ruleMaker.initializeEverything(mapLayer=mapLayer, version08=version08, tilesetConfig=tilesetXML)
+    return _writeDocument(ruleMaker.makeRule())
+
+def autotileMap(tiledMap, tilesetNames=None, mapLayers=None, outsideIsTerrain=False, mapDirectory="."):
+    """Autotiles the layers of <tiledMap>, the text or bytes of a tmx file, or a binary file object. External tilesets are read relatively to <mapDirectory>.
+    Returns the bytes of the autotiled tmx file and the number of cells which changed. See the autotile command for the other arguments."""
+    mapTree = _parseXML(tiledMap, "map")
+    changedCells = MapAutotiler("map", ".tmx").autotileMap(mapTree, tilesetNames, mapLayers, outsideIsTerrain, mapDirectory)
+    outputFile = io.BytesIO()
+    mapTree.write(outputFile, encoding="UTF-8", xml_declaration=True)
+    return outputFile.getvalue(), changedCells
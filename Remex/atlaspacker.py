@@ -0,0 +1,139 @@
+import json
+from PIL import Image as ImagePIL
+
+def nextPowerOfTwo(value):
+    powerOfTwo = 1
+    while powerOfTwo < value:
+        powerOfTwo *= 2
+    return powerOfTwo
+
+class MaxRectsBin:
+    """A rectangular bin in which rectangles are placed with the MaxRects algorithm.
+    The bin keeps the list of the maximal free rectangles, and each new rectangle goes where it leaves the shortest side free (best short side fit)."""
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self._freeRects = [(0, 0, width, height)]
+
+    def _findPosition(self, width, height):
+        bestPosition, bestShortSide, bestLongSide = None, None, None
+        for freeAbs, freeOrd, freeWidth, freeHeight in self._freeRects:
+            if freeWidth >= width and freeHeight >= height:
+                shortSide, longSide = min(freeWidth-width, freeHeight-height), max(freeWidth-width, freeHeight-height)
+                if bestPosition is None or (shortSide, longSide) < (bestShortSide, bestLongSide):
+                    bestPosition, bestShortSide, bestLongSide = (freeAbs, freeOrd), shortSide, longSide
+        return bestPosition
+
+    def _splitFreeRect(self, freeRect, usedRect):
+        """Returns the free rectangles left of <freeRect> once <usedRect> is taken, or None when they do not overlap."""
+        freeAbs, freeOrd, freeWidth, freeHeight = freeRect
+        usedAbs, usedOrd, usedWidth, usedHeight = usedRect
+        if usedAbs >= freeAbs+freeWidth or usedAbs+usedWidth <= freeAbs or usedOrd >= freeOrd+freeHeight or usedOrd+usedHeight <= freeOrd:
+            return None
+        splitRects = []
+        if usedAbs > freeAbs:
+            splitRects.append((freeAbs, freeOrd, usedAbs-freeAbs, freeHeight))
+        if usedAbs+usedWidth < freeAbs+freeWidth:
+            splitRects.append((usedAbs+usedWidth, freeOrd, freeAbs+freeWidth-usedAbs-usedWidth, freeHeight))
+        if usedOrd > freeOrd:
+            splitRects.append((freeAbs, freeOrd, freeWidth, usedOrd-freeOrd))
+        if usedOrd+usedHeight < freeOrd+freeHeight:
+            splitRects.append((freeAbs, usedOrd+usedHeight, freeWidth, freeOrd+freeHeight-usedOrd-usedHeight))
+        return splitRects
+
+    def _pruneFreeRects(self):
+        """Removes the free rectangles contained in another one."""
+        def isContained(rect, otherRect):
+            return rect[0] >= otherRect[0] and rect[1] >= otherRect[1] and rect[0]+rect[2] <= otherRect[0]+otherRect[2] and rect[1]+rect[3] <= otherRect[1]+otherRect[3]
+        freeRects = list(set(self._freeRects))
+        self._freeRects = [rect for i, rect in enumerate(freeRects) if not any(j != i and isContained(rect, otherRect) for j, otherRect in enumerate(freeRects))]
+
+    def insert(self, width, height):
+        """Places a rectangle of <width>x<height> and returns its position, or None when it does not fit anymore."""
+        position = self._findPosition(width, height)
+        if position is None:
+            return None
+        usedRect, freeRects = position + (width, height), []
+        for freeRect in self._freeRects:
+            splitRects = self._splitFreeRect(freeRect, usedRect)
+            freeRects += [freeRect] if splitRects is None else splitRects
+        self._freeRects = freeRects
+        self._pruneFreeRects()
+        return position
+
+class AtlasPacker:
+    """Packs named images into as few power-of-two atlases as possible, none of them larger than <maxSize>.
+    Each image can be surrounded by <extrusion> copies of its border pixels, so that filtering does not bleed the neighbouring images in, and by <padding> transparent pixels."""
+    def __init__(self, maxSize=2048, extrusion=0, padding=0):
+        self._maxSize, self._extrusion, self._padding = maxSize, extrusion, padding
+
+    def _getBorder(self):
+        return self._extrusion + self._padding
+
+    def _packBin(self, sizes, names, binWidth, binHeight):
+        """Places the images of <names> in a bin, in this order, and returns the placements of the ones which fit."""
+        maxRectsBin, placements, border = MaxRectsBin(binWidth, binHeight), dict(), self._getBorder()
+        for name in names:
+            width, height = sizes[name]
+            position = maxRectsBin.insert(width + 2*border, height + 2*border)
+            if position is not None:
+                placements[name] = position[0] + border, position[1] + border
+        return placements
+
+    def pack(self, images):
+        """<images> is a list of (name, image). Returns a list of (atlas, placements), where placements maps each name to its rectangle (x, y, width, height) in the atlas."""
+        sizes = dict([(name, image.size) for name, image in images])
+        border = self._getBorder()
+        for name, (width, height) in sizes.items():
+            if width + 2*border > self._maxSize or height + 2*border > self._maxSize:
+                raise ValueError("The image \"{0}\" does not fit in an atlas of {1}x{1} pixels.".format(name, self._maxSize))
+        #The largest images are placed first, as they are the hardest to place
+        remainingNames = sorted(sizes.keys(), key=lambda name: (max(sizes[name]), sizes[name][0]*sizes[name][1], name), reverse=True)
+        packedBins = []
+        while len(remainingNames) > 0:
+            area = sum([(sizes[name][0]+2*border) * (sizes[name][1]+2*border) for name in remainingNames])
+            binWidth = min(nextPowerOfTwo(max([sizes[name][0]+2*border for name in remainingNames] + [int(area ** 0.5)])), self._maxSize)
+            binHeight = min(nextPowerOfTwo(max([sizes[name][1]+2*border for name in remainingNames] + [area // binWidth])), self._maxSize)
+            placements = self._packBin(sizes, remainingNames, binWidth, binHeight)
+            #The bin grows by doubling its shortest side until everything fits, or until it reaches the largest size
+            while len(placements) < len(remainingNames) and (binWidth < self._maxSize or binHeight < self._maxSize):
+                if binWidth <= binHeight and binWidth < self._maxSize or binHeight >= self._maxSize:
+                    binWidth *= 2
+                else:
+                    binHeight *= 2
+                placements = self._packBin(sizes, remainingNames, binWidth, binHeight)
+            packedBins.append((binWidth, binHeight, placements))
+            remainingNames = [name for name in remainingNames if name not in placements]
+        imagesByName = dict(images)
+        atlases = []
+        for binWidth, binHeight, placements in packedBins:
+            atlas = ImagePIL.new("RGBA", (binWidth, binHeight), (0, 0, 0, 0))
+            rects = dict()
+            for name, (imageAbs, imageOrd) in placements.items():
+                image = imagesByName[name].convert("RGBA")
+                self._pasteExtruded(atlas, image, imageAbs, imageOrd)
+                rects[name] = (imageAbs, imageOrd) + image.size
+            atlases.append((atlas, rects))
+        return atlases
+
+    def _pasteExtruded(self, atlas, image, imageAbs, imageOrd):
+        width, height = image.size
+        extrusion = self._extrusion
+        if extrusion > 0:
+            #The border rows and columns are stretched around the image, then the corners are filled with the corner pixels
+            atlas.paste(image.crop((0, 0, width, 1)).resize((width, extrusion), ImagePIL.NEAREST), (imageAbs, imageOrd-extrusion))
+            atlas.paste(image.crop((0, height-1, width, height)).resize((width, extrusion), ImagePIL.NEAREST), (imageAbs, imageOrd+height))
+            atlas.paste(image.crop((0, 0, 1, height)).resize((extrusion, height), ImagePIL.NEAREST), (imageAbs-extrusion, imageOrd))
+            atlas.paste(image.crop((width-1, 0, width, height)).resize((extrusion, height), ImagePIL.NEAREST), (imageAbs+width, imageOrd))
+            for cornerAbs, cornerOrd, targetAbs, targetOrd in [(0, 0, imageAbs-extrusion, imageOrd-extrusion), (width-1, 0, imageAbs+width, imageOrd-extrusion), (0, height-1, imageAbs-extrusion, imageOrd+height), (width-1, height-1, imageAbs+width, imageOrd+height)]:
+                atlas.paste(image.getpixel((cornerAbs, cornerOrd)), (targetAbs, targetOrd, targetAbs+extrusion, targetOrd+extrusion))
+        atlas.paste(image, (imageAbs, imageOrd))
+
+def makeManifest(atlasFilenames, atlases, extrusion=0, padding=0):
+    """Returns the JSON manifest giving the atlas and the rectangle of each packed image."""
+    frames = dict()
+    for atlasIndex, (atlas, rects) in enumerate(atlases):
+        for name, (imageAbs, imageOrd, width, height) in rects.items():
+            frames[name] = dict(atlas=atlasIndex, x=imageAbs, y=imageOrd, w=width, h=height)
+    description = dict(atlases=[dict(image=atlasFilename, width=atlas.size[0], height=atlas.size[1]) for atlasFilename, (atlas, rects) in zip(atlasFilenames, atlases)],
+            extrusion=extrusion, padding=padding, frames=dict(sorted(frames.items())))
+    return json.dumps(description, indent=1)
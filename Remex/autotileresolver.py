@@ -0,0 +1,122 @@
+from autotiletypes import ExpandedAutotileTypes
+
+#Bit of each neighbour in the neighbour bitmask of a cell, with its offset from the cell
+NeighbourBits = [
+        ("N", (0, -1), 1),
+        ("NE", (1, -1), 2),
+        ("E", (1, 0), 4),
+        ("SE", (1, 1), 8),
+        ("S", (0, 1), 16),
+        ("SO", (-1, 1), 32),
+        ("O", (-1, 0), 64),
+        ("NO", (-1, -1), 128),
+        ]
+
+def _getCornerType(verticalNeighbour, horizontalNeighbour, diagonalNeighbour, isolated):
+    if verticalNeighbour and horizontalNeighbour:
+        return "Normal" if diagonalNeighbour else "External angle"
+    elif verticalNeighbour:
+        return "VerticalEdge"
+    elif horizontalNeighbour:
+        return "HorizontalEdge"
+    #With at most one neighbour, the corners without neighbours come from the showcase tile
+    return "Showcase" if isolated else "Internal angle"
+
+def makeNeighbourTable():
+    """Returns the list of the tile of the expanded autotile to use for each of the 256 neighbour bitmasks.
+    The minitiles of each corner are chosen from the neighbours around the corner, then the tile made of these minitiles is looked up in ExpandedAutotileTypes.
+    It gives the same tile as the patterns of the automapping rules of RuleMaker for every bitmask."""
+    neighbourTable = []
+    for neighbourMask in range(256):
+        north, east, south, west = [neighbourMask & bit != 0 for bit in (1, 4, 16, 64)]
+        isolated = north + east + south + west <= 1
+        tileTypes = (_getCornerType(north, west, neighbourMask & 128, isolated), _getCornerType(north, east, neighbourMask & 2, isolated),
+                _getCornerType(south, west, neighbourMask & 32, isolated), _getCornerType(south, east, neighbourMask & 8, isolated))
+        neighbourTable.append(ExpandedAutotileTypes.index(tileTypes))
+    return neighbourTable
+
+class AutotileResolver:
+    """Chooses which of the 48 tiles of an expanded autotile each cell of a terrain mask gets, without going through Tiled.
+    A cell only depends on which of its 8 neighbours are terrain too, so the tile is read in a 256-entry table indexed by the neighbour bitmask.
+    The terrain masks and the results are numpy arrays."""
+    _neighbourTable = None
+
+    def __init__(self, emptyIndex=-1, outsideIsTerrain=False):
+        """<emptyIndex> is the value given to the cells which are not terrain.
+        <outsideIsTerrain> tells whether the cells outside the map count as terrain, so that the terrain does not get borders along the edges of the map."""
+        self._emptyIndex, self._outsideIsTerrain = emptyIndex, outsideIsTerrain
+
+    def getNeighbourTable(self):
+        import numpy
+        if AutotileResolver._neighbourTable is None:
+            AutotileResolver._neighbourTable = numpy.array(makeNeighbourTable(), dtype=numpy.int16)
+        return AutotileResolver._neighbourTable
+
+    def _getPaddedNeighbourMasks(self, paddedTerrain):
+        import numpy
+        height, width = paddedTerrain.shape[0]-2, paddedTerrain.shape[1]-2
+        paddedTerrain = paddedTerrain.view(numpy.uint8)
+        neighbourMasks = numpy.zeros((height, width), dtype=numpy.uint8)
+        for direction, (offsetAbs, offsetOrd), bit in NeighbourBits:
+            neighbourMasks |= paddedTerrain[1+offsetOrd:1+offsetOrd+height, 1+offsetAbs:1+offsetAbs+width] * numpy.uint8(bit)
+        return neighbourMasks
+
+    def getNeighbourMasks(self, terrain):
+        """Returns the neighbour bitmask of every cell of the 2D array <terrain>, which is true where there is terrain."""
+        import numpy
+        terrain = numpy.asarray(terrain, dtype=bool)
+        return self._getPaddedNeighbourMasks(numpy.pad(terrain, 1, constant_values=self._outsideIsTerrain))
+
+    def resolve(self, terrain):
+        """Returns the index of the tile of the expanded autotile for every cell of <terrain>, or the empty index where there is no terrain."""
+        import numpy
+        terrain = numpy.asarray(terrain, dtype=bool)
+        return numpy.where(terrain, self.getNeighbourTable()[self.getNeighbourMasks(terrain)], numpy.int16(self._emptyIndex))
+
+    def resolveRegion(self, terrain, tileIndices, left, top, width, height):
+        """Updates in place the tile indices <tileIndices> of <terrain> after the terrain changed in the given rectangle of cells.
+        Only the rectangle and the cells around it can get another tile, so they are the only ones computed again.
+        Returns the updated rectangle (left, top, width, height), clipped to the map."""
+        import numpy
+        mapHeight, mapWidth = terrain.shape
+        updatedLeft, updatedTop = max(left-1, 0), max(top-1, 0)
+        updatedRight, updatedBottom = min(left+width+1, mapWidth), min(top+height+1, mapHeight)
+        if updatedLeft >= updatedRight or updatedTop >= updatedBottom:
+            return updatedLeft, updatedTop, 0, 0
+        #The cells to update, with a border of neighbours taken from the map, or from the outside where the map ends
+        paddedTerrain = numpy.full((updatedBottom-updatedTop+2, updatedRight-updatedLeft+2), self._outsideIsTerrain, dtype=bool)
+        sourceLeft, sourceTop = max(updatedLeft-1, 0), max(updatedTop-1, 0)
+        sourceRight, sourceBottom = min(updatedRight+1, mapWidth), min(updatedBottom+1, mapHeight)
+        paddedTerrain[sourceTop-updatedTop+1:sourceBottom-updatedTop+1, sourceLeft-updatedLeft+1:sourceRight-updatedLeft+1] = terrain[sourceTop:sourceBottom, sourceLeft:sourceRight]
+        updatedTerrain = paddedTerrain[1:-1, 1:-1]
+        updatedIndices = self.getNeighbourTable()[self._getPaddedNeighbourMasks(paddedTerrain)]
+        tileIndices[updatedTop:updatedBottom, updatedLeft:updatedRight] = numpy.where(updatedTerrain, updatedIndices, numpy.int16(self._emptyIndex))
+        return updatedLeft, updatedTop, updatedRight-updatedLeft, updatedBottom-updatedTop
+
+class IncrementalAutotileMap:
+    """A terrain map whose tile indices are kept up to date as the terrain is painted, for interactive editors.
+    Each change only computes again the changed cells and their border."""
+    def __init__(self, terrain, resolver=None):
+        import numpy
+        self._resolver = resolver if resolver is not None else AutotileResolver()
+        self.terrain = numpy.array(terrain, dtype=bool)
+        self.tileIndices = self._resolver.resolve(self.terrain)
+
+    def paint(self, left, top, terrainPatch):
+        """Copies the 2D array <terrainPatch> into the terrain at (<left>, <top>), clipped to the map.
+        Returns the rectangle (left, top, width, height) of the cells whose tile index may have changed."""
+        import numpy
+        terrainPatch = numpy.asarray(terrainPatch, dtype=bool)
+        mapHeight, mapWidth = self.terrain.shape
+        patchLeft, patchTop = max(-left, 0), max(-top, 0)
+        right, bottom = min(left+terrainPatch.shape[1], mapWidth), min(top+terrainPatch.shape[0], mapHeight)
+        left, top = max(left, 0), max(top, 0)
+        if left >= right or top >= bottom:
+            return left, top, 0, 0
+        self.terrain[top:bottom, left:right] = terrainPatch[patchTop:patchTop+bottom-top, patchLeft:patchLeft+right-left]
+        return self._resolver.resolveRegion(self.terrain, self.tileIndices, left, top, right-left, bottom-top)
+
+    def fill(self, left, top, width, height, isTerrain):
+        """Sets a rectangle of cells to terrain or to no terrain. Returns the rectangle of the cells whose tile index may have changed."""
+        import numpy
+        return self.paint(left, top, numpy.full((height, width), isTerrain, dtype=bool))
@@ -0,0 +1,52 @@
+"""The tiles of an expanded autotile, shared by the scripts and by the autotile resolver, which engines can use without the rest of Remex."""
+
+ExpandedAutotileTypes = [ #The types of the NO, NE, SO and SE minitiles of each of the 48 tiles of an expanded autotile
+        ("Normal", "Normal", "Normal", "Normal"),
+        ("External angle", "Normal", "Normal", "Normal"),
+        ("Normal", "External angle", "Normal", "Normal"),
+        ("External angle", "External angle", "Normal", "Normal"),
+        ("Normal", "Normal", "Normal", "External angle"),
+        ("External angle", "Normal", "Normal", "External angle"),
+        ("Normal", "External angle", "Normal", "External angle"),
+        ("External angle", "External angle", "Normal", "External angle"),
+        ("Normal", "Normal", "External angle", "Normal"),
+        ("External angle", "Normal", "External angle", "Normal"),
+        ("Normal", "External angle", "External angle", "Normal"),
+        ("External angle", "External angle", "External angle", "Normal"),
+        ("Normal", "Normal", "External angle", "External angle"),
+        ("External angle", "Normal", "External angle", "External angle"),
+        ("Normal", "External angle", "External angle", "External angle"),
+        ("External angle", "External angle", "External angle", "External angle"),
+        ("VerticalEdge", "Normal", "VerticalEdge", "Normal"),
+        ("VerticalEdge", "External angle", "VerticalEdge", "Normal"),
+        ("VerticalEdge", "Normal", "VerticalEdge", "External angle"),
+        ("VerticalEdge", "External angle", "VerticalEdge", "External angle"),
+        ("HorizontalEdge", "HorizontalEdge", "Normal", "Normal"),
+        ("HorizontalEdge", "HorizontalEdge", "Normal", "External angle"),
+        ("HorizontalEdge", "HorizontalEdge", "External angle", "Normal"),
+        ("HorizontalEdge", "HorizontalEdge", "External angle", "External angle"),
+        ("Normal", "VerticalEdge", "Normal", "VerticalEdge"),
+        ("Normal", "VerticalEdge", "External angle", "VerticalEdge"),
+        ("External angle", "VerticalEdge", "Normal", "VerticalEdge"),
+        ("External angle", "VerticalEdge", "External angle", "VerticalEdge"),
+        ("Normal", "Normal", "HorizontalEdge", "HorizontalEdge"),
+        ("External angle", "Normal", "HorizontalEdge", "HorizontalEdge"),
+        ("Normal", "External angle", "HorizontalEdge", "HorizontalEdge"),
+        ("External angle", "External angle", "HorizontalEdge", "HorizontalEdge"),
+        ("VerticalEdge", "VerticalEdge", "VerticalEdge", "VerticalEdge"),
+        ("HorizontalEdge", "HorizontalEdge", "HorizontalEdge", "HorizontalEdge"),
+        ("Internal angle", "HorizontalEdge", "VerticalEdge", "Normal"),
+        ("Internal angle", "HorizontalEdge", "VerticalEdge", "External angle"),
+        ("HorizontalEdge", "Internal angle", "Normal", "VerticalEdge"),
+        ("HorizontalEdge", "Internal angle", "External angle", "VerticalEdge"),
+        ("Normal", "VerticalEdge", "HorizontalEdge", "Internal angle"),
+        ("External angle", "VerticalEdge", "HorizontalEdge", "Internal angle"),
+        ("VerticalEdge", "Normal", "Internal angle", "HorizontalEdge"),
+        ("VerticalEdge", "External angle", "Internal angle", "HorizontalEdge"),
+        ("Showcase", "Showcase", "VerticalEdge", "VerticalEdge"),
+        ("Showcase", "HorizontalEdge", "Showcase", "HorizontalEdge"),
+        ("VerticalEdge", "VerticalEdge", "Showcase", "Showcase"),
+        ("HorizontalEdge", "Showcase", "HorizontalEdge", "Showcase"),
+        ("Showcase", "Showcase", "Showcase", "Showcase"),
+        ("Dummy", "Dummy", "Dummy", "Dummy"),
+        ]
@@ -0,0 +1,85 @@
+"""Measures how long the commands of Remex take from the start of the interpreter to the end, on tiny inputs, so that the time is mostly the startup.
+It also checks that each command does not import the heavy modules it does not need, and fails when one of them is imported."""
+import compileall, statistics, subprocess, sys, tempfile, time
+from os import path
+from argparse import ArgumentParser
+
+RemexDirectory = path.dirname(path.abspath(__file__))
+HeavyModules = ["tkinter", "PIL", "xml", "numpy", "multiprocessing"]
+#The heavy modules which each command must not import
+ForbiddenModules = {
+        "help": ["tkinter", "PIL", "xml", "numpy", "multiprocessing"],
+        "extract": ["tkinter", "xml", "numpy", "multiprocessing"],
+        "expand": ["tkinter", "xml", "numpy", "multiprocessing"],
+        "maketileset": ["tkinter", "numpy", "multiprocessing"],
+        "makerule": ["tkinter", "PIL", "numpy", "multiprocessing"],
+        }
+
+def makeInputs(directory):
+    """Writes a blank chipset, autotile and expanded autotile in <directory>, and returns the arguments of each command."""
+    from PIL import Image as ImagePIL
+    from main import ChipsetImageWidth, ChipsetImageHeight, AutotileImageWidth, AutotileImageHeight, AutoTilesetImageWidth, AutoTilesetImageHeight
+    chipset, autotile, expandedAutotile = [path.join(directory, filename) for filename in ("chipset.png", "autotile.png", "expandedAutotile.png")]
+    ImagePIL.new("RGB", (ChipsetImageWidth, ChipsetImageHeight), (255, 255, 255)).save(chipset)
+    ImagePIL.new("RGB", (AutotileImageWidth, AutotileImageHeight), (255, 255, 255)).save(autotile)
+    ImagePIL.new("RGB", (AutoTilesetImageWidth, AutoTilesetImageHeight), (255, 255, 255)).save(expandedAutotile)
+    tileset = path.join(directory, "tileset.tsx")
+    return [("help", ["-h"]),
+            ("extract", ["extract", chipset, "-o", path.join(directory, "chipset"), "-f"]),
+            ("expand", ["expand", autotile, "-o", path.join(directory, "expanded.png"), "-f"]),
+            ("maketileset", ["maketileset", expandedAutotile, "-o", tileset, "-f"]),
+            ("makerule", ["makerule", tileset, "-o", path.join(directory, "rule.tmx"), "-f"])]
+
+def runCommand(arguments, pythonOptions=[]):
+    completedProcess = subprocess.run([sys.executable] + pythonOptions + [path.join(RemexDirectory, EntryScript)] + arguments, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+    if completedProcess.returncode != 0:
+        print("The command \"{0}\" failed:\n{1}".format(" ".join(arguments), completedProcess.stderr))
+        raise SystemExit(1)
+    return completedProcess.stderr
+
+def listImportedModules(arguments):
+    """Returns the names of the modules imported by the command, as reported by -X importtime."""
+    importedModules = set()
+    for line in runCommand(arguments, ["-X", "importtime"]).splitlines():
+        if line.startswith("import time:") and "|" in line:
+            importedModules.add(line.rsplit("|", 1)[1].strip())
+    return importedModules
+
+def timeCommand(arguments, runs, pythonArguments=None):
+    """Returns the durations in milliseconds of <runs> runs of the command, or of the interpreter alone with <pythonArguments>."""
+    durations = []
+    for i in range(runs):
+        start = time.perf_counter()
+        if pythonArguments is not None:
+            subprocess.run([sys.executable] + pythonArguments, check=True)
+        else:
+            runCommand(arguments)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+def isImported(moduleName, importedModules):
+    return any(importedModule == moduleName or importedModule.startswith(moduleName + ".") for importedModule in importedModules)
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures the startup time of each command of Remex, and checks the modules it imports.")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="The number of times each command is run. By default, 10.")
+    parser.add_argument("-s", "--script", dest="entryScript", default="remex.py", help="The script starting Remex: \"remex.py\" by default, or \"main.py\".")
+    answers = parser.parse_args()
+    EntryScript = answers.entryScript
+    sys.path.insert(0, RemexDirectory)
+    compileall.compile_dir(RemexDirectory, maxlevels=0, quiet=1) #The modules are measured as they usually start, from their cached bytecode
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        commands = makeInputs(directory)
+        print("{0:<12} {1:>10} {2:>10}  {3}".format("command", "median ms", "min ms", "heavy modules"))
+        durations = timeCommand([], answers.runs, ["-c", "pass"]) #The time of the interpreter alone, for reference
+        print("{0:<12} {1:>10.1f} {2:>10.1f}  {3}".format("(python)", statistics.median(durations), min(durations), "-"))
+        for commandName, arguments in commands:
+            durations = timeCommand(arguments, answers.runs)
+            importedModules = listImportedModules(arguments)
+            heavyModules = [moduleName for moduleName in HeavyModules if isImported(moduleName, importedModules)]
+            print("{0:<12} {1:>10.1f} {2:>10.1f}  {3}".format(commandName, statistics.median(durations), min(durations), ", ".join(heavyModules) or "-"))
+            failures += ["\"{0}\" imports {1}".format(commandName, moduleName) for moduleName in ForbiddenModules[commandName] if moduleName in heavyModules]
+    if len(failures) > 0:
+        print("Some commands import modules they do not need:\n" + "\n".join(failures))
+        raise SystemExit(1)
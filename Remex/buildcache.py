@@ -0,0 +1,42 @@
+import hashlib, json, os
+from os import path
+
+class BuildCache:
+    """Remembers which outputs were made from which inputs, so that unchanged outputs are not made again.
+    Each entry is stored in its own file, so that several processes can share the same cache directory."""
+    def __init__(self, cacheDirectory):
+        self._cacheDirectory = cacheDirectory
+
+    def makeKey(self, command, data, options, outputFilenames):
+        """Returns the key of the outputs made by <command> from the bytes <data>, with the options in the dictionary <options>."""
+        digest = hashlib.sha256()
+        description = dict(command=command, options=options, outputs=[path.abspath(outputFilename) for outputFilename in outputFilenames])
+        digest.update(json.dumps(description, sort_keys=True).encode())
+        digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()
+
+    def _entryFilename(self, key):
+        return path.join(self._cacheDirectory, key[:2], key + ".json")
+
+    def _describeOutput(self, outputFilename):
+        outputStat = os.stat(outputFilename)
+        return [outputStat.st_size, outputStat.st_mtime_ns]
+
+    def isUpToDate(self, key, outputFilenames):
+        """Tells whether the outputs of <key> were made before and were not modified or deleted since."""
+        try:
+            with open(self._entryFilename(key)) as entryFile:
+                outputs = json.load(entryFile)["outputs"]
+            return all(outputs.get(path.abspath(outputFilename)) == self._describeOutput(outputFilename) for outputFilename in outputFilenames)
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def record(self, key, outputFilenames):
+        """Remembers that <outputFilenames> were just made for <key>."""
+        entryFilename = self._entryFilename(key)
+        os.makedirs(path.dirname(entryFilename), exist_ok=True)
+        outputs = dict([(path.abspath(outputFilename), self._describeOutput(outputFilename)) for outputFilename in outputFilenames])
+        temporaryFilename = "{0}.{1}.tmp".format(entryFilename, os.getpid())
+        with open(temporaryFilename, "w") as entryFile:
+            json.dump(dict(outputs=outputs), entryFile)
+        os.replace(temporaryFilename, entryFilename)
@@ -1,5 +1,8 @@
 from argparse import ArgumentParser
-from main import *
+import xml.etree.ElementTree
+from main import AutotileExpander, TilesetGenerator, RuleMaker
+import profiler
+from profiler import stage
 from PIL import ImageTk
 from PIL import Image as ImagePIL
 from tkinter import Tk, W, S, E, N, ttk, filedialog, messagebox, Text, INSERT, VERTICAL, HORIZONTAL, IntVar, StringVar
@@ -73,7 +76,8 @@ class ScriptGUI(GUI):
 
     def _inputIsCorrect(self, emptyStringWarning=True):
         if self._inputFilename != "" and path.exists(self._inputFilename) is True:
-            return self._checkInput()
+            with stage("validate"):
+                return self._checkInput()
         else:
             if emptyStringWarning:
                 messagebox.showwarning(title=self._noInputFileFound, message=self._noInputFileFoundLonger, detail=self._noInputFileFoundExplanation.format(self._inputFilename))
@@ -81,7 +85,8 @@ class ScriptGUI(GUI):
 
     def _proceed(self):
         if self._inputIsCorrect():
-            self._makeOutput()
+            with stage("make output"):
+                self._makeOutput()
             self._prepareSaveWindow()
 
     def _prepareSaveWindow(self):
@@ -101,7 +106,8 @@ class ScriptGUI(GUI):
         if self._saveFilename != "":
             if self._saveFilename.lower().endswith(self._outputFileExtension) is False:
                 self._saveFilename += self._outputFileExtension
-            self._saveData()
+            with stage("save"):
+                self._saveData()
         self._frame.mainloop()
 
 class ExpanderGUI(ScriptGUI):
@@ -133,7 +139,7 @@ class ExpanderGUI(ScriptGUI):
 
     def _makeOutput(self):
         autotileExpander = AutotileExpander("autotile", ".png")
-        self._expandedAutotile = autotileExpander.expandAutotile(self._inputFilename)
+        self._expandedAutotile = autotileExpander.expandAutotile(self._imageAutotile)
 
     def _showOutput(self):
         self._imageWidget = ImageTk.PhotoImage(self._expandedAutotile)
@@ -198,8 +204,7 @@ class RuleMakerGUI(ScriptGUI):
 
     def _checkInput(self):
         try:
-            tilesetConfig = xml.dom.minidom.parse(self._inputFilename)
-            tilesetXML = tilesetConfig.documentElement
+            tilesetXML = xml.etree.ElementTree.parse(self._inputFilename).getroot()
         except Exception as error:
             print("An error was encountered while loading the tileset {0}. Details:\n{1}".format(self._inputFilename,error))
             messagebox.showwarning(title="The tileset is invalid", message="An error was encountered while loading the tileset.", detail="{0}".format(error))
@@ -311,6 +316,12 @@ class RemexGUI(GUI):
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
+    parser.add_argument("--profile", metavar="traceFile", dest="traceFilename", default=None, help="Measures the stages of everything done in the GUI, prints them as a table when the GUI is closed, and writes them in <traceFile> as a Chrome trace.")
     answers = vars(parser.parse_args())
-    gui = RemexGUI()
-    gui.launch(answers["verbose"])
+    if answers["traceFilename"] is not None:
+        profiler.startProfiling()
+    try:
+        gui = RemexGUI()
+        gui.launch(answers["verbose"])
+    finally:
+        profiler.stopProfiling(answers["traceFilename"])
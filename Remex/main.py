@@ -12,16 +12,53 @@ DecoImageWidth = DecoPageWidth*1
 DecoImageHeight = DecoPageHeight*3
 AutoTilesetImageWidth = TileSize*8
 AutoTilesetImageHeight = TileSize*6
+RemexVersion = "1.1"
 
-import xml.dom.minidom, base64, zlib, array
-from PIL import Image as ImagePIL
-from PIL import ImageTk
+#Pillow, the XML modules and the codecs of Tiled are only imported by the functions which need them, so that each command only loads what it uses
+import glob, io, json, os, struct, threading
 from os import path
 from sys import argv
+from contextlib import redirect_stdout
 from argparse import ArgumentParser
 from interacter import *
+from buildcache import BuildCache
+from autotiletypes import ExpandedAutotileTypes
+import profiler
+from profiler import stage, isProfiling
+
+ImageFormatExtensions = {"png": ".png", "raw": ".raw"} #The raw format is described in rawimage
+
+class RemexError(Exception):
+    """Base of the errors raised by the cores of Remex. The scripts print them and stop, the library API lets them through."""
+
+class InvalidImageError(RemexError, ValueError):
+    """The input cannot be read as an image, or is not an indexed image although its palette must be kept."""
+
+class InvalidSizeError(RemexError, ValueError):
+    """The input image does not have the size of a chipset or of an autotile."""
+
+class InvalidMapError(RemexError, ValueError):
+    """The input is not a map or a tileset for Tiled, or the map cannot be autotiled."""
+
+class UnsupportedFormatError(RemexError, ValueError):
+    """The requested output format does not exist."""
+
+#The checks name their input with <subject>, so that the scripts can give the filename in the message
+def checkIndexedImage(image, subject="The image"):
+    if image.mode != "P":
+        raise InvalidImageError("{0} is not an indexed image, so its palette cannot be kept.".format(subject))
+
+def checkChipsetSize(image, subject="The chipset"):
+    if image.size != (ChipsetImageWidth, ChipsetImageHeight):
+        raise InvalidSizeError("{0} does not have the right size.\nIt must be {1}x{2} pixels wide. Please refer to chipset formatting from RPG Maker 200x.".format(subject, ChipsetImageWidth, ChipsetImageHeight))
+
+def checkAutotileSize(image, subject="The autotile"):
+    if image.size != (AutotileImageWidth, AutotileImageHeight):
+        raise InvalidSizeError("{0} does not have the right size.\nIt must be {1}x{2} pixels wide. Please extract autotiles from an RPG Maker 200x chipset with this program first.".format(subject, AutotileImageWidth, AutotileImageHeight))
 
 class Script:
+    _input, _inputData, _cache, _upToDate, _imageFormat = None, None, None, False, "png"
+
     def __init__(self, inputFileDescription, outputFileExtenion):
         self._inputFileDescription, self._outputFileExtension = inputFileDescription, outputFileExtenion
 
@@ -29,6 +66,88 @@ class Script:
         if self._verbose is True:
             print(message)
             
+    def setCache(self, cache):
+        """Makes the script skip its work when its outputs are up to date in <cache>, a BuildCache."""
+        self._cache = cache
+
+    def _openInput(self, inputSource):
+        from PIL import Image as ImagePIL
+        return ImagePIL.open(inputSource)
+
+    def _loadInput(self):
+        """Opens the input only once: the validity and size checks and the processing all share the same input object.
+        Opening an image only reads its header, its pixels are decoded the first time they are used."""
+        if self._input is None:
+            with stage("read input") as record:
+                if self._inputData is not None: #The input was already read to compute its cache key
+                    self._input = self._openInput(io.BytesIO(self._inputData))
+                    record.bytesRead = len(self._inputData)
+                else:
+                    self._input = self._openInput(self._inputFilename)
+                    record.bytesRead = path.getsize(self._inputFilename)
+        return self._input
+
+    def _cacheOptions(self):
+        return dict()
+
+    def _cacheOutputs(self):
+        return [self._outputFilename]
+
+    def _isUpToDate(self):
+        if self._cache is None or path.isfile(self._inputFilename) is False:
+            return False
+        with stage("check cache") as record:
+            with open(self._inputFilename, "rb") as inputFile:
+                self._inputData = inputFile.read()
+            record.bytesRead = len(self._inputData)
+            self._makeCacheKey()
+            return self._cache.isUpToDate(self._cacheKey, self._cacheOutputFilenames)
+
+    def _makeCacheKey(self):
+        self._cacheOutputFilenames = self._cacheOutputs()
+        self._cacheKey = self._cache.makeKey("{0} {1}".format(self.__class__.__name__, RemexVersion), self._inputData, self._cacheOptions(), self._cacheOutputFilenames)
+
+    def _recordCache(self):
+        if self._cache is not None and self._inputData is not None:
+            self._cache.record(self._cacheKey, self._cacheOutputFilenames)
+
+    def _writeImage(self, image, outputFilename):
+        """Writes <image> in the image format of the script: PNG, or raw pixels which can be mapped in memory without decoding."""
+        with stage("encode " + self._imageFormat):
+            if self._imageFormat == "raw":
+                from rawimage import makeRawImage
+                imageData = makeRawImage(image)
+            else:
+                imageFile = io.BytesIO()
+                image.save(imageFile, "PNG")
+                imageData = imageFile.getvalue()
+        writeOutput(outputFilename, imageData)
+
+    def _saveImage(self, image, description):
+        """Saves <image> as the current output file, unless the cache tells that this very image was already saved there.
+        The palette and the transparency are part of the image: the variants of the recolor command only differ by the palette, and keying indexed tiles only changes the transparency."""
+        self._checkArguments("Output already exists")
+        if self._cache is not None:
+            outputKey = self._cache.makeKey("{0} output {1}".format(self.__class__.__name__, RemexVersion), image.tobytes(), dict(mode=image.mode, size=image.size, palette=image.getpalette(), transparency=repr(image.info.get("transparency")), imageFormat=self._imageFormat), [self._outputFilename])
+            if self._cache.isUpToDate(outputKey, [self._outputFilename]):
+                self._printVerbose("The {0} \"{1}\" is up to date.".format(description, self._outputFilename))
+                return
+        self._writeImage(image, self._outputFilename)
+        if self._cache is not None:
+            self._cache.record(outputKey, [self._outputFilename])
+        self._printVerbose("Successfully created the {0} \"{1}\"!".format(description, self._outputFilename))
+
+    def _getInputSubject(self):
+        return "The input {0} \"{1}\"".format(self._inputFileDescription, self._inputFilename)
+
+    def _stopOnError(self, function, *arguments):
+        """Calls a function of the cores and returns its result. If it raises a RemexError, the message is printed and the script stops."""
+        try:
+            return function(*arguments)
+        except RemexError as error:
+            print(error)
+            raise SystemExit
+
     def _checkInputValidity(self):
         pass
 
@@ -63,368 +182,696 @@ class Script:
 
     def launchScript(self, inputFilename, outputFilename, askConfirmation, verbose, testSteps=["Input exists", "Input validity", "Input size", "Output without extension", "Output already exists"]):
         self._inputFilename, self._outputFilename, self._askConfirmation, self._verbose = inputFilename.replace("\\", "/"), outputFilename.replace("\\", "/"), askConfirmation, verbose
+        self._input, self._inputData, self._upToDate = None, None, False
         self._interacter = Interacter()
-        i = True
-        while i < len(testSteps):
-            self._checkArguments(testSteps[i])
-            i += 1
+        if self._isUpToDate():
+            self._upToDate = True
+            self._printVerbose("The outputs made from \"{0}\" are up to date.".format(self._inputFilename))
+            return
+        with stage("validate"):
+            i = True
+            while i < len(testSteps):
+                self._checkArguments(testSteps[i])
+                i += 1
+        if self._cache is not None and self._inputData is not None:
+            self._makeCacheKey() #The checks may have added the extension to the output
 
-class TileExtractor(Script):
-    def _initializeLocations(self):
-        self._waterTilePositions = [
-                (TileSize*0, TileSize*0),
-                (TileSize*3, TileSize*0),
-                (TileSize*0, TileSize*4)
-                ]
-        self._animTilePositions = [
-                (TileSize*3, TileSize*4)
-                ]
-        self._autotilePositions = [
-                (TileSize*0, TileSize*8),
-                (TileSize*3, TileSize*8),
-                (TileSize*0, TileSize*12),
-                (TileSize*3, TileSize*12),
-                (TileSize*6, TileSize*0),
-                (TileSize*9, TileSize*0),
-                (TileSize*6, TileSize*4),
-                (TileSize*9, TileSize*4),
-                (TileSize*6, TileSize*8),
-                (TileSize*9, TileSize*8),
-                (TileSize*6, TileSize*12),
-                (TileSize*9, TileSize*12)
-                ]
-        self._lowTilePositions = [
-                (TileSize*12, TileSize*0),
-                (TileSize*12, TileSize*8),
-                (TileSize*18, TileSize*0),
-                ]
-        self._highTilePositions = [
-                (TileSize*18, TileSize*8),
-                (TileSize*24, TileSize*0),
-                (TileSize*24, TileSize*8),
-                ]
+def writeOutput(outputFilename, data, mode="wb"):
+    """Writes the bytes or the text <data> in the file <outputFilename>."""
+    with stage("write") as record:
+        with open(outputFilename, mode) as outputFile:
+            outputFile.write(data)
+        record.bytesWritten = len(data)
 
-    def _extractAutotiles(self, imageChipset, positions):
-        autotiles = []
-        for position in positions:
-            autotileSurface = imageChipset.crop((position[0], position[1],
-                position[0]+AutotileImageWidth, position[1]+AutotileImageHeight))
-            autotiles += [autotileSurface]
-        return autotiles
+def writeDocument(outputFilename, xmlData):
+    """Writes a minidom or streamed XML document. A streamed document is generated while it is written, so this stage includes building it."""
+    with stage("write xml") as record:
+        with open(outputFilename, "w") as outputFile:
+            xmlData.writexml(outputFile, addindent="  ", newl="\n", encoding="UTF-8")
+        record.bytesWritten = path.getsize(outputFilename)
 
-    def _extractDecoTiles(self, imageChipset, positions, transparentColorPos):
-        image = ImagePIL.new("RGB", (DecoImageWidth, DecoImageHeight))
-        i = 0
-        for position in positions:
-            page = imageChipset.crop((position[0], position[1],
-                position[0]+DecoPageWidth, position[1]+DecoPageHeight))
-            image.paste(page, (0, i*DecoPageHeight))
-            i += 1
+class ColorKeyer:
+    """Makes the pixels of an image matching one of several key colors transparent, using bulk image operations."""
+    def __init__(self, keyColors, tolerance=0):
+        """<keyColors> is a list of RGB tuples. A pixel is keyed when none of its channels differs from a key color by more than <tolerance>."""
+        self._keyColors, self._tolerance = [tuple(keyColor[:3]) for keyColor in keyColors], tolerance
+        self._thresholdTable = [0 if value <= tolerance else 255 for value in range(256)]
 
-        if transparentColorPos != None:
-            transparentColor = image.getpixel(transparentColorPos)
-            data = image.getdata()
-            alphadata = []
-            for color in data:
-                if color == transparentColor:
-                    alphadata.append(0)
-                else:
-                    alphadata.append(255)
+    def makeMask(self, image):
+        """Returns an "L" image which is 0 where <image> matches a key color and 255 elsewhere."""
+        from PIL import Image as ImagePIL, ImageChops
+        image = image.convert("RGB")
+        mask = ImagePIL.new("L", image.size, 255)
+        for keyColor in self._keyColors:
+            difference = ImageChops.difference(image, ImagePIL.new("RGB", image.size, keyColor))
+            red, green, blue = difference.split()
+            maximumDifference = ImageChops.lighter(ImageChops.lighter(red, green), blue)
+            mask = ImageChops.darker(mask, maximumDifference.point(self._thresholdTable))
+        return mask
 
-            alphaimage = ImagePIL.new("L", image.size)
-            alphaimage.putdata(alphadata)
-            image.putalpha(alphaimage)
+    def applyTo(self, image):
+        image.putalpha(self.makeMask(image))
+        return image
 
+    def findKeyIndices(self, palette):
+        """Returns the indices of the colors of <palette>, a flat list of RGB values, which match a key color."""
+        return [i for i in range(len(palette) // 3) if any(max([abs(palette[i*3+channel] - keyColor[channel]) for channel in range(3)]) <= self._tolerance for keyColor in self._keyColors)]
+
+    def applyToIndexed(self, image, keyIndices=[]):
+        """Makes the palette indices of the "P" image <image> matching a key color transparent, as well as <keyIndices>. The pixels themselves are not changed."""
+        keyIndices = set(keyIndices + self.findKeyIndices(image.getpalette("RGB")))
+        if len(keyIndices) == 1:
+            image.info["transparency"] = keyIndices.pop()
+        elif len(keyIndices) > 1:
+            image.info["transparency"] = bytes([0 if i in keyIndices else 255 for i in range(256)])
         return image
 
-    def extractTiles(self, chipsetFilename):
-        imageChipset = ImagePIL.open(chipsetFilename)
-        self._imageChipset = imageChipset
-        self._waterTiles = self._extractAutotiles(imageChipset, self._waterTilePositions)
-        self._animTiles = self._extractAutotiles(imageChipset, self._animTilePositions)
-        self._autotiles = self._extractAutotiles(imageChipset, self._autotilePositions)
-        self._lowTiles = self._extractDecoTiles(imageChipset, self._lowTilePositions, None)
-        self._highTiles = self._extractDecoTiles(imageChipset, self._highTilePositions, (0, 0))
+def copyPalette(sourceImage, targetImage):
+    """Gives the "P" image <targetImage> the palette and the transparency of <sourceImage>."""
+    targetImage.putpalette(sourceImage.getpalette("RGB"))
+    if "transparency" in sourceImage.info:
+        targetImage.info["transparency"] = sourceImage.info["transparency"]
+    return targetImage
+
+#Positions of the groups of tiles in a chipset
+WaterTilePositions = [
+        (TileSize*0, TileSize*0),
+        (TileSize*3, TileSize*0),
+        (TileSize*0, TileSize*4)
+        ]
+AnimTilePositions = [
+        (TileSize*3, TileSize*4)
+        ]
+AutotilePositions = [
+        (TileSize*0, TileSize*8),
+        (TileSize*3, TileSize*8),
+        (TileSize*0, TileSize*12),
+        (TileSize*3, TileSize*12),
+        (TileSize*6, TileSize*0),
+        (TileSize*9, TileSize*0),
+        (TileSize*6, TileSize*4),
+        (TileSize*9, TileSize*4),
+        (TileSize*6, TileSize*8),
+        (TileSize*9, TileSize*8),
+        (TileSize*6, TileSize*12),
+        (TileSize*9, TileSize*12)
+        ]
+LowTilePositions = [
+        (TileSize*12, TileSize*0),
+        (TileSize*12, TileSize*8),
+        (TileSize*18, TileSize*0),
+        ]
+HighTilePositions = [
+        (TileSize*18, TileSize*8),
+        (TileSize*24, TileSize*0),
+        (TileSize*24, TileSize*8),
+        ]
+
+def cropAutotiles(imageChipset, positions):
+    autotiles = []
+    for position in positions:
+        autotileSurface = imageChipset.crop((position[0], position[1],
+            position[0]+AutotileImageWidth, position[1]+AutotileImageHeight))
+        autotiles += [autotileSurface]
+    return autotiles
+
+def makeDecoTiles(imageChipset, positions, transparentColorPos, keyColors=[], keyTolerance=0, indexed=False):
+    """Returns the pages of deco tiles at <positions> in the chipset, one below the other.
+    When <transparentColorPos> is given, the color of the pixel there and the <keyColors> are made transparent."""
+    from PIL import Image as ImagePIL
+    if indexed is True: #The tiles keep the indices of the pixels and the palette of the chipset
+        image = copyPalette(imageChipset, ImagePIL.new("P", (DecoImageWidth, DecoImageHeight)))
+    else:
+        image = ImagePIL.new("RGB", (DecoImageWidth, DecoImageHeight))
+    i = 0
+    for position in positions:
+        page = imageChipset.crop((position[0], position[1],
+            position[0]+DecoPageWidth, position[1]+DecoPageHeight))
+        image.paste(page, (0, i*DecoPageHeight))
+        i += 1
+
+    with stage("color key"):
+        _keyDecoTiles(image, transparentColorPos, keyColors, keyTolerance, indexed)
+    return image
+
+def _keyDecoTiles(image, transparentColorPos, keyColors, keyTolerance, indexed):
+    if transparentColorPos != None and indexed is True:
+        transparentIndex = image.getpixel(transparentColorPos)
+        transparentColor = image.getpalette("RGB")[transparentIndex*3:transparentIndex*3+3]
+        ColorKeyer([transparentColor] + list(keyColors), keyTolerance).applyToIndexed(image, [transparentIndex])
+    elif transparentColorPos != None:
+        transparentColor = image.getpixel(transparentColorPos)
+        ColorKeyer([transparentColor] + list(keyColors), keyTolerance).applyTo(image)
+
+def extractChipsetTiles(imageChipset, keyColors=[], keyTolerance=0, indexed=False):
+    """Returns the water tiles, the anim tiles, the autotiles, the low deco tiles and the high deco tiles of the chipset image <imageChipset>.
+    It only reads the chipset, so several threads can extract chipsets at the same time. A chipset shared between threads must be loaded first."""
+    with stage("decode"):
+        imageChipset.load()
+    with stage("crop"):
+        waterTiles = cropAutotiles(imageChipset, WaterTilePositions)
+        animTiles = cropAutotiles(imageChipset, AnimTilePositions)
+        autotiles = cropAutotiles(imageChipset, AutotilePositions)
+    lowTiles = makeDecoTiles(imageChipset, LowTilePositions, None, keyColors, keyTolerance, indexed)
+    highTiles = makeDecoTiles(imageChipset, HighTilePositions, (0, 0), keyColors, keyTolerance, indexed)
+    return waterTiles, animTiles, autotiles, lowTiles, highTiles
+
+def listChipsetTiles(waterTiles, animTiles, autotiles, lowTiles, highTiles):
+    """Returns the (description, suffix, image) of every group of tiles returned by extractChipsetTiles."""
+    extractedTiles = [("water tile", "_w{0}".format(i), tile) for i, tile in enumerate(waterTiles)]
+    extractedTiles += [("anim tile", "_an", tile) for tile in animTiles]
+    extractedTiles += [("autotile", "_at{0}".format(i), tile) for i, tile in enumerate(autotiles)]
+    extractedTiles += [("low deco tile", "_lo", lowTiles), ("high deco tile", "_hi", highTiles)]
+    return extractedTiles
+
+class TileExtractor(Script):
+    _extraKeyColors, _keyTolerance, _indexed = [], 0, False
+
+    def _initializeLocations(self):
+        self._waterTilePositions, self._animTilePositions, self._autotilePositions = WaterTilePositions, AnimTilePositions, AutotilePositions
+        self._lowTilePositions, self._highTilePositions = LowTilePositions, HighTilePositions
+
+    def _extractAutotiles(self, imageChipset, positions):
+        return cropAutotiles(imageChipset, positions)
+
+    def _extractDecoTiles(self, imageChipset, positions, transparentColorPos):
+        return makeDecoTiles(imageChipset, positions, transparentColorPos, self._extraKeyColors, self._keyTolerance, self._indexed)
+
+    def extractTiles(self, chipset):
+        """<chipset> is either the filename of the chipset, or the chipset image itself. See extractChipsetTiles."""
+        from PIL import Image as ImagePIL
+        if isinstance(chipset, str):
+            chipset = ImagePIL.open(chipset)
+        self._imageChipset = chipset
+        self._waterTiles, self._animTiles, self._autotiles, self._lowTiles, self._highTiles = extractChipsetTiles(chipset, self._extraKeyColors, self._keyTolerance, self._indexed)
 
     def _checkInputValidity(self):
             try:
-                image = ImagePIL.open(self._inputFilename)
+                self._loadInput()
             except IOError as error:
                 print("The input chipset \"{0}\" is not a valid PNG image. Details:\n{1}".format(self._inputFilename, error))
                 raise SystemExit
+            if self._indexed is True:
+                self._stopOnError(checkIndexedImage, self._loadInput(), self._getInputSubject())
 
     def _checkInputSize(self):
-            image = ImagePIL.open(self._inputFilename)
-            if image.size != (ChipsetImageWidth, ChipsetImageHeight):
-                print("The input chipset \"{0}\" does not have the right size.\nIt must be {1}x{2} pixels wide. Please refer to chipset formatting from RPG Maker 200x.".format(self._inputFilename, ChipsetImageWidth, ChipsetImageHeight))
-                raise SystemExit
+            self._stopOnError(checkChipsetSize, self._loadInput(), self._getInputSubject())
 
-    def launchScript(self, inputFilename, outputFilename, askConfirmation, verbose, testSteps=["Input exists", "Input validity", "Input size"]):
+    def _cacheOptions(self):
+        return dict(keyColors=self._extraKeyColors, keyTolerance=self._keyTolerance, imageFormat=self._imageFormat, indexed=self._indexed)
+
+    def _cacheOutputs(self):
+        return self.listOutputFilenames(self._outputFilename)
+
+    def launchScript(self, inputFilename, outputFilename, askConfirmation, verbose, keyColors=[], keyTolerance=0, imageFormat="png", indexed=False, testSteps=["Input exists", "Input validity", "Input size"]):
+        self._extraKeyColors, self._keyTolerance, self._imageFormat, self._indexed = list(keyColors), keyTolerance, imageFormat, indexed
         super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
+        if self._upToDate is True:
+            return
         self._initializeLocations()
-        self.extractTiles(self._inputFilename)
+        self.extractTiles(self._loadInput())
         outputFilenamePrefix = self._outputFilename
-        i = 0
-        for watertile in self._waterTiles:
-            self._outputFilename = "{0}_w{1}{2}".format(outputFilenamePrefix, i, self._outputFileExtension)
-            self._checkArguments("Output already exists")
-            watertile.save(self._outputFilename, "PNG")
-            self._printVerbose("Successfully created the water tile \"{0}\"!".format(self._outputFilename))
-            i += 1
-        i = 0
-        for animtile in self._animTiles:
-            self._outputFilename = "{0}_an{1}".format(outputFilenamePrefix, self._outputFileExtension)
-            self._checkArguments("Output already exists")
-            animtile.save(self._outputFilename, "PNG")
-            self._printVerbose("Successfully created the anim tile \"{0}\"!".format(self._outputFilename))
-            i += 1
-        i = 0
-        for autotile in self._autotiles:
-            self._outputFilename = "{0}_at{1}{2}".format(outputFilenamePrefix, i, self._outputFileExtension)
-            self._checkArguments("Output already exists")
-            autotile.save(self._outputFilename, "PNG")
-            self._printVerbose("Successfully created the autotile \"{0}\"!".format(self._outputFilename))
-            i += 1
+        for description, suffix, tile in self.listExtractedTiles():
+            self._outputFilename = "{0}{1}{2}".format(outputFilenamePrefix, suffix, self._outputFileExtension)
+            self._saveImage(tile, description)
+        self._recordCache()
 
-        self._outputFilename = "{0}_lo{1}".format(outputFilenamePrefix, self._outputFileExtension)
-        self._checkArguments("Output already exists")
-        self._lowTiles.save(self._outputFilename, "PNG")
-        self._printVerbose("Successfully created the low deco tile \"{0}\"!".format(self._outputFilename))
+    def listExtractedTiles(self):
+        """Returns the (description, suffix, image) of every group of tiles extracted by extractTiles."""
+        return listChipsetTiles(self._waterTiles, self._animTiles, self._autotiles, self._lowTiles, self._highTiles)
 
-        self._outputFilename = "{0}_hi{1}".format(outputFilenamePrefix, self._outputFileExtension)
-        self._checkArguments("Output already exists")
-        self._highTiles.save(self._outputFilename, "PNG")
-        self._printVerbose("Successfully created the high deco tile \"{0}\"!".format(self._outputFilename))
+    def listOutputFilenames(self, outputFilenamePrefix):
+        outputFilenames = ["{0}_w{1}{2}".format(outputFilenamePrefix, i, self._outputFileExtension) for i in range(3)]
+        outputFilenames += ["{0}_an{1}".format(outputFilenamePrefix, self._outputFileExtension)]
+        outputFilenames += ["{0}_at{1}{2}".format(outputFilenamePrefix, i, self._outputFileExtension) for i in range(12)]
+        outputFilenames += ["{0}_lo{1}".format(outputFilenamePrefix, self._outputFileExtension), "{0}_hi{1}".format(outputFilenamePrefix, self._outputFileExtension)]
+        return outputFilenames
+
+def collectFiles(sources, extension, manifestFilename=None):
+    """Returns the files found in <sources> and in the manifest file, without duplicates.
+    Each source is either a file, a directory in which every file with <extension> is taken, or a glob pattern."""
+    if manifestFilename is not None:
+        manifestDirectory = path.dirname(manifestFilename)
+        with open(manifestFilename) as manifestFile:
+            sources = list(sources) + [path.join(manifestDirectory, line.strip()) for line in manifestFile if line.strip() != "" and line.strip().startswith("#") is False]
+    files = []
+    for source in sources:
+        source = source.replace("\\", "/")
+        if path.isdir(source):
+            found = sorted(glob.glob(path.join(source, "*" + extension)) + glob.glob(path.join(source, "*" + extension.upper())))
+        elif glob.has_magic(source):
+            found = sorted(glob.glob(source))
+        else:
+            found = [source]
+        for foundFile in found:
+            foundFile = foundFile.replace("\\", "/")
+            if foundFile not in files:
+                files.append(foundFile)
+    return files
+
+def _extractChipsetJob(job):
+    inputChipset, outputPrefix, keyColors, keyTolerance, imageFormat, indexed, verbose, cacheDirectory = job
+    messages, succeeded = io.StringIO(), True
+    with redirect_stdout(messages):
+        try:
+            tileExtractor = TileExtractor("chipset", ImageFormatExtensions[imageFormat])
+            if cacheDirectory is not None:
+                tileExtractor.setCache(BuildCache(cacheDirectory))
+            tileExtractor.launchScript(inputChipset, outputPrefix, False, verbose, keyColors=keyColors, keyTolerance=keyTolerance, imageFormat=imageFormat, indexed=indexed)
+        except SystemExit:
+            succeeded = False
+        except Exception as error:
+            print("An error was encountered while extracting the chipset \"{0}\". Details:\n{1}".format(inputChipset, error))
+            succeeded = False
+    return inputChipset, succeeded, messages.getvalue()
+
+class BatchTileExtractor:
+    """Extracts the tiles from many chipsets, spread across a pool of processes."""
+    def collectChipsets(self, sources, manifestFilename=None):
+        """Returns the sorted chipsets found in <sources> (files, directories or glob patterns) and in the manifest, without duplicates."""
+        return collectFiles(sources, ".png", manifestFilename)
+
+    def _outputPrefix(self, outputPrefix, chipset):
+        return "{0}_{1}".format(outputPrefix, path.splitext(path.basename(chipset))[0])
+
+    def _printResults(self, results):
+        """Prints the messages of each job, and returns the number of chipsets which failed."""
+        failures = 0
+        for inputChipset, succeeded, messages in results: #Results come back in the order of the chipsets, whatever the process which handled them
+            print(messages, end="")
+            if succeeded is False:
+                failures += 1
+                print("Failed to extract the chipset \"{0}\".".format(inputChipset))
+        return failures
+
+    def launchBatch(self, sources, outputPrefix, askConfirmation, verbose, jobs=1, manifestFilename=None, keyColors=[], keyTolerance=0, imageFormat="png", indexed=False, cacheDirectory=None):
+        chipsets = self.collectChipsets(sources, manifestFilename)
+        if len(chipsets) == 0:
+            print("No chipset was found to extract.")
+            raise SystemExit(1)
+        outputPrefixes = [self._outputPrefix(outputPrefix, chipset) for chipset in chipsets]
+        if len(set(outputPrefixes)) != len(outputPrefixes):
+            print("Several chipsets have the same name, so their output files would overwrite each other. Please rename them or extract them separately.")
+            raise SystemExit(1)
+        existingOutputs = [outputFilename for prefix in outputPrefixes for outputFilename in TileExtractor("chipset", ImageFormatExtensions[imageFormat]).listOutputFilenames(prefix) if path.exists(outputFilename)]
+        if len(existingOutputs) > 0 and askConfirmation is True:
+            answerIgnoreExistingOutput = Interacter().askString("{0} output files already exist, such as \"{1}\". Do you want to overwrite them? (y/N)".format(len(existingOutputs), existingOutputs[0]))
+            if answerIgnoreExistingOutput.lower().split(" ")[0] != "y":
+                print("Correct, I'm stopping here.")
+                raise SystemExit
+            print("Fine, I'll overwrite the existing files.")
+        jobList = [(chipset, prefix, list(keyColors), keyTolerance, imageFormat, indexed, verbose, cacheDirectory) for chipset, prefix in zip(chipsets, outputPrefixes)]
+        if jobs <= 0:
+            jobs = os.cpu_count() or 1
+        if isProfiling() is True:
+            jobs = 1 #The stages run by other processes would not be measured
+        if jobs == 1 or len(jobList) == 1:
+            failures = self._printResults(map(_extractChipsetJob, jobList))
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(jobs, len(jobList))) as pool: #The processes are stopped even if the results cannot be read
+                failures = self._printResults(pool.map(_extractChipsetJob, jobList))
+        print("Extracted {0} of {1} chipsets.".format(len(chipsets) - failures, len(chipsets)))
+        if failures > 0:
+            raise SystemExit(1)
+
+#Positions of the minitiles in a group of 2x2 minitiles
+MinitilePositions = ["NO", "NE", "SO", "SE"]
+MinitileTypes = ["Normal", "External angle", "Internal angle", "HorizontalEdge", "VerticalEdge", "Showcase", "Dummy"]
+
+def makeMinitileLocations():
+    """Returns the type of the minitile at each (group abscissa, group ordinate, position) of an autotile, and the position of each offset in a group."""
+    minitileTypeDependingOnGroup, minitilePositionGroup = dict(), dict()
+    #Directions depending on the position in the group
+    minitilePositionGroup[0, 0], minitilePositionGroup[MiniTileSize, 0], minitilePositionGroup[0, MiniTileSize], minitilePositionGroup[MiniTileSize, MiniTileSize] = "NO", "NE", "SO", "SE"
+    #Types of the minitiles depending on their groups and directions
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "NO"] = "Showcase"
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "NE"] = "Showcase"
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "SO"] = "Showcase"
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "SE"] = "Showcase"
+
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "NO"] = "Dummy"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "NE"] = "Dummy"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "SE"] = "Dummy"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "SO"] = "Dummy"
+
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "NO"] = "External angle"
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "NE"] = "External angle"
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "SO"] = "External angle"
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "SE"] = "External angle"
+
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*1, "NO"] = "Internal angle"
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*1, "NE"] = "Internal angle"
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*3, "SO"] = "Internal angle"
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*3, "SE"] = "Internal angle"
+
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*1, "NO"] = "HorizontalEdge"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*1, "NE"] = "HorizontalEdge"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*3, "SO"] = "HorizontalEdge"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*3, "SE"] = "HorizontalEdge"
+
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*2, "NO"] = "VerticalEdge"
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*2, "NE"] = "VerticalEdge"
+    minitileTypeDependingOnGroup[TileSize*0, TileSize*2, "SO"] = "VerticalEdge"
+    minitileTypeDependingOnGroup[TileSize*2, TileSize*2, "SE"] = "VerticalEdge"
+
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "NO"] = "Normal"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "NE"] = "Normal"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "SE"] = "Normal"
+    minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "SO"] = "Normal"
+    return minitileTypeDependingOnGroup, minitilePositionGroup
+
+#The plans of the expander are compiled once, by the first thread which needs them: the lock keeps the other threads from compiling them again or seeing them half made
+_expanderPlans, _expanderPlanLock = dict(), threading.RLock()
+
+def _getExpanderPlan(planKey, compilePlan):
+    plan = _expanderPlans.get(planKey)
+    if plan is None:
+        with _expanderPlanLock:
+            plan = _expanderPlans.get(planKey)
+            if plan is None:
+                plan = compilePlan()
+                _expanderPlans[planKey] = plan
+    return plan
+
+def _compileMinitileSources():
+    minitileTypeDependingOnGroup, minitilePositionGroup = makeMinitileLocations()
+    minitileOffset = dict([(minitilePosition, offset) for offset, minitilePosition in minitilePositionGroup.items()])
+    minitileSources = dict()
+    for (groupAbs, groupOrd, minitilePosition), minitileType in minitileTypeDependingOnGroup.items():
+        offsetAbs, offsetOrd = minitileOffset[minitilePosition]
+        minitileSources[minitilePosition, minitileType] = groupAbs+offsetAbs, groupOrd+offsetOrd
+    return minitileSources
+
+def getMinitileSources():
+    """Returns the position in the autotile of the minitile of each (position, type)."""
+    return _getExpanderPlan("minitileSources", _compileMinitileSources)
+
+def _compileGatherPlan():
+    """Compiles the position of every run of MiniTileSize source pixels making each row of the expanded autotile.
+    The runs are listed in the order of the rows of the expanded autotile, so expanding only means concatenating them."""
+    minitileSources, gatherPlan = getMinitileSources(), []
+    for expandedOrd in range(AutoTilesetImageHeight):
+        autotileOrd, minitileOrd, pixelOrd = expandedOrd // TileSize, (expandedOrd % TileSize) // MiniTileSize, expandedOrd % MiniTileSize
+        for expandedAbs in range(0, AutoTilesetImageWidth, MiniTileSize):
+            autotileAbs, minitileAbs = expandedAbs // TileSize, (expandedAbs % TileSize) // MiniTileSize
+            minitileIndex = minitileOrd*2 + minitileAbs
+            minitileType = ExpandedAutotileTypes[autotileOrd*(AutoTilesetImageWidth//TileSize) + autotileAbs][minitileIndex]
+            sourceAbs, sourceOrd = minitileSources[MinitilePositions[minitileIndex], minitileType]
+            gatherPlan.append((sourceOrd+pixelOrd)*AutotileImageWidth + sourceAbs)
+    return gatherPlan
+
+def getGatherPlan(bytesPerPixel):
+    """Returns the gather plan as byte slices for images with <bytesPerPixel> bytes per pixel."""
+    gatherPlan = _getExpanderPlan("gatherPlan", _compileGatherPlan)
+    return _getExpanderPlan(("gatherPlanSlices", bytesPerPixel), lambda: [(start*bytesPerPixel, (start+MiniTileSize)*bytesPerPixel) for start in gatherPlan])
+
+def _compileGatherIndex():
+    import numpy
+    gatherPlan = _getExpanderPlan("gatherPlan", _compileGatherPlan)
+    return (numpy.array(gatherPlan, dtype=numpy.intp)[:, None] + numpy.arange(MiniTileSize, dtype=numpy.intp)).ravel()
+
+def getGatherIndex():
+    """Returns the gather plan as a flat numpy array of source pixel indices, one per pixel of the expanded autotile."""
+    return _getExpanderPlan("gatherIndex", _compileGatherIndex)
+
+def _prepareAutotile(autotile, indexed):
+    """Returns the autotile in "RGB", or as it is with <indexed>, cropped to the size of an autotile."""
+    if indexed is True:
+        checkIndexedImage(autotile, "The autotile")
+    imageAutotile = autotile if indexed is True else autotile.convert("RGB")
+    if imageAutotile.size != (AutotileImageWidth, AutotileImageHeight):
+        imageAutotile = imageAutotile.crop((0, 0, AutotileImageWidth, AutotileImageHeight))
+    return imageAutotile
+
+def _makeExpandedImage(imageAutotile, expandedData, height=AutoTilesetImageHeight):
+    from PIL import Image as ImagePIL
+    expandedImage = ImagePIL.frombytes(imageAutotile.mode, (AutoTilesetImageWidth, height), expandedData)
+    if imageAutotile.mode == "P":
+        copyPalette(imageAutotile, expandedImage)
+    return expandedImage
+
+#The functions below only read their arguments and the compiled plans, so several threads can expand autotiles at the same time.
+#An image shared between threads must be loaded first, as Pillow loads images lazily.
+
+def expandAutotileImage(autotile, indexed=False):
+    """Returns the expanded autotile of the autotile image <autotile>.
+    With <indexed>, the autotile must be a "P" image: the pixels are moved as palette indices, and the expanded autotile keeps the palette and the transparency."""
+    with stage("decode"):
+        imageAutotile = _prepareAutotile(autotile, indexed)
+    #### The minitiles are gathered from the raw pixels in a single pass
+    with stage("gather"):
+        autotileData = imageAutotile.tobytes()
+        expandedData = b"".join([autotileData[start:end] for start, end in getGatherPlan(len(imageAutotile.getbands()))])
+    with stage("assemble"):
+        return _makeExpandedImage(imageAutotile, expandedData)
+
+def expandAutotileImages(autotiles, indexed=False):
+    """Expands many autotiles at once.
+    <autotiles> is either a list of autotile images, in which case a list of expanded autotile images is returned,
+    or a numpy array of shape (N, 64, 48) or (N, 64, 48, C), in which case an array of shape (N, 96, 128) or (N, 96, 128, C) is returned.
+    With <indexed>, the images must be "P" images sharing the same palette, like the autotiles of a chipset."""
+    if hasattr(autotiles, "shape"):
+        with stage("gather"):
+            stackedAutotiles = autotiles.reshape((autotiles.shape[0], AutotileImageHeight*AutotileImageWidth) + autotiles.shape[3:])
+            expandedAutotiles = stackedAutotiles.take(getGatherIndex(), axis=1)
+            return expandedAutotiles.reshape((autotiles.shape[0], AutoTilesetImageHeight, AutoTilesetImageWidth) + autotiles.shape[3:])
+    with stage("decode"):
+        autotilesData = []
+        for autotile in autotiles:
+            imageAutotile = _prepareAutotile(autotile, indexed)
+            autotilesData.append(imageAutotile.tobytes())
+    if len(autotilesData) == 0:
+        return []
+    with stage("gather"):
+        gatherPlan = getGatherPlan(len(imageAutotile.getbands()))
+        expandedData = b"".join([autotileData[start:end] for autotileData in autotilesData for start, end in gatherPlan])
+    with stage("assemble"):
+        expandedSheets = _makeExpandedImage(imageAutotile, expandedData, AutoTilesetImageHeight*len(autotilesData))
+        expandedAutotiles = [expandedSheets.crop((0, i*AutoTilesetImageHeight, AutoTilesetImageWidth, (i+1)*AutoTilesetImageHeight)) for i in range(len(autotilesData))]
+        if indexed is True: #Cropping keeps the palette, but not the transparency
+            expandedAutotiles = [copyPalette(imageAutotile, expandedAutotile) for expandedAutotile in expandedAutotiles]
+    return expandedAutotiles
+
+def makeMinitileAtlas(autotile, atlasColumns=8, indexed=False):
+    """Returns the minitile atlas of the autotile image <autotile> and the composition of the 48 tiles of the expanded autotile.
+    The atlas only holds the distinct minitiles, in rows of <atlasColumns>. The composition gives for each tile the index in the atlas of its NO, NE, SO and SE minitiles.
+    With <indexed>, the autotile must be a "P" image, and the atlas keeps its palette."""
+    from PIL import Image as ImagePIL
+    with stage("decode"):
+        imageAutotile = _prepareAutotile(autotile, indexed)
+    minitileSources = getMinitileSources()
+    minitiles, minitileIndices, composition = [], dict(), []
+    for tileTypes in ExpandedAutotileTypes:
+        tileComposition = []
+        for minitilePosition, minitileType in zip(MinitilePositions, tileTypes):
+            sourceAbs, sourceOrd = minitileSources[minitilePosition, minitileType]
+            minitile = imageAutotile.crop((sourceAbs, sourceOrd, sourceAbs+MiniTileSize, sourceOrd+MiniTileSize))
+            minitileData = minitile.tobytes()
+            if minitileData not in minitileIndices: #Identical minitiles are only stored once
+                minitileIndices[minitileData] = len(minitiles)
+                minitiles.append(minitile)
+            tileComposition.append(minitileIndices[minitileData])
+        composition.append(tileComposition)
+    atlasRows = (len(minitiles) + atlasColumns - 1) // atlasColumns
+    atlas = ImagePIL.new(imageAutotile.mode, (atlasColumns*MiniTileSize, atlasRows*MiniTileSize))
+    if indexed is True:
+        copyPalette(imageAutotile, atlas)
+    for i, minitile in enumerate(minitiles):
+        atlas.paste(minitile, ((i % atlasColumns)*MiniTileSize, (i // atlasColumns)*MiniTileSize))
+    return atlas, composition
 
 class AutotileExpander(Script):
+    _indexed = False
+    #Header of the binary composition index: magic, version, tile size, minitile size, number of columns of the atlas, number of minitiles, number of tiles
+    MinitileIndexHeader, MinitileIndexMagic, MinitileIndexVersion = struct.Struct("<4s6B"), b"RMXM", 1
 
     def _initializeLocations(self):
-        self._minitiles, self._minitilePosition, self._minitileType = dict(NO=dict(), NE=dict(), SO=dict(), SE=dict()), dict(), dict()
-        self._minitileTypeDependingOnGroup, self._minitilePositionGroup = dict(), dict()
-        #List of the possible types and directions
-        self._minitileType, self._minitilePosition = ["Normal", "External angle", "Internal angle", "HorizontalEdge", "VerticalEdge", "Showcase", "Dummy"], ["NO", "NE", "SO", "SE"]
-        #Directions depending on the position in the group
-        self._minitilePositionGroup[0, 0], self._minitilePositionGroup[MiniTileSize, 0], self._minitilePositionGroup[0, MiniTileSize], self._minitilePositionGroup[MiniTileSize, MiniTileSize] = "NO", "NE", "SO", "SE"
-        #Types of the minitiles depending on their groups and directions
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "NO"] = "Showcase"
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "NE"] = "Showcase"
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "SO"] = "Showcase"
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*0, "SE"] = "Showcase"
-
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "NO"] = "Dummy"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "NE"] = "Dummy"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "SE"] = "Dummy"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*0, "SO"] = "Dummy"
-
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "NO"] = "External angle"
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "NE"] = "External angle"
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "SO"] = "External angle"
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*0, "SE"] = "External angle"
-
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*1, "NO"] = "Internal angle"
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*1, "NE"] = "Internal angle"
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*3, "SO"] = "Internal angle"
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*3, "SE"] = "Internal angle"
-
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*1, "NO"] = "HorizontalEdge"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*1, "NE"] = "HorizontalEdge"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*3, "SO"] = "HorizontalEdge"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*3, "SE"] = "HorizontalEdge"
-
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*2, "NO"] = "VerticalEdge"
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*2, "NE"] = "VerticalEdge"
-        self._minitileTypeDependingOnGroup[TileSize*0, TileSize*2, "SO"] = "VerticalEdge"
-        self._minitileTypeDependingOnGroup[TileSize*2, TileSize*2, "SE"] = "VerticalEdge"
-
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "NO"] = "Normal"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "NE"] = "Normal"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "SE"] = "Normal"
-        self._minitileTypeDependingOnGroup[TileSize*1, TileSize*2, "SO"] = "Normal"
-
-    def _makeAutotile(self, *types):
-        autotileSurface = ImagePIL.new("RGB", (TileSize,TileSize))
-        minitileAbs, minitileOrd, i = 0, 0, 0
-        while minitileOrd < TileSize:
-            minitileAbs = 0
-            while minitileAbs < TileSize:
-                minitilePosition = self._minitilePositionGroup[minitileAbs, minitileOrd]
-                minitileType = types[i]
-                minitileSurface = self._minitiles[minitilePosition][minitileType]
-                autotileSurface.paste(minitileSurface, (minitileAbs, minitileOrd))
-                i += 1
-                minitileAbs += MiniTileSize
-            minitileOrd += MiniTileSize
-        return autotileSurface
+        self._minitileTypeDependingOnGroup, self._minitilePositionGroup = makeMinitileLocations()
+        self._minitileType, self._minitilePosition = MinitileTypes, MinitilePositions
 
-    def expandAutotile(self, autotileFilename):
-        self._imageAutotile = ImagePIL.open(autotileFilename)
-        self._initializeLocations()
-        #### First we find the minitiles, then we use their types and position to sort them
-        groupAbs, groupOrd = 0, 0
-        while groupOrd < self._imageAutotile.size[1]: #We run through the groups of minitiles
-            groupAbs = 0
-            while groupAbs < self._imageAutotile.size[0]:
-                minitileAbs, minitileOrd = 0, 0
-                while minitileOrd < TileSize: #We run through the minitiles
-                    minitileAbs = 0
-                    while minitileAbs < TileSize:
-                        minitilePosition = self._minitilePositionGroup[minitileAbs, minitileOrd]
-                        #### IB: In RPGM2k not all minitiles in the image are used
-                        if (groupAbs, groupOrd, minitilePosition) in self._minitileTypeDependingOnGroup:
-                            minitileType = self._minitileTypeDependingOnGroup[groupAbs, groupOrd, minitilePosition]
-                            self._minitiles[minitilePosition][minitileType] = self._imageAutotile.crop((groupAbs+minitileAbs, groupOrd+minitileOrd, groupAbs+minitileAbs+MiniTileSize, groupOrd+minitileOrd+MiniTileSize))
-                        minitileAbs += MiniTileSize
-                    minitileOrd += MiniTileSize
-                groupAbs += TileSize
-            groupOrd += TileSize
-        ##### We define the types composing the 48 autotiles
-        autotilesSurfaces = dict()
-        autotilesSurfaces[0] = self._makeAutotile("Normal", "Normal", "Normal", "Normal")
-        autotilesSurfaces[1] = self._makeAutotile("External angle", "Normal", "Normal", "Normal")
-        autotilesSurfaces[2] = self._makeAutotile("Normal", "External angle", "Normal", "Normal")
-        autotilesSurfaces[3] = self._makeAutotile("External angle", "External angle", "Normal", "Normal")
-        autotilesSurfaces[4] = self._makeAutotile("Normal", "Normal", "Normal", "External angle")
-        autotilesSurfaces[5] = self._makeAutotile("External angle", "Normal", "Normal", "External angle")
-        autotilesSurfaces[6] = self._makeAutotile("Normal", "External angle", "Normal", "External angle")
-        autotilesSurfaces[7] = self._makeAutotile("External angle", "External angle", "Normal", "External angle")
-        autotilesSurfaces[8] = self._makeAutotile("Normal", "Normal", "External angle", "Normal")
-        autotilesSurfaces[9] = self._makeAutotile("External angle", "Normal", "External angle", "Normal")
-        autotilesSurfaces[10] = self._makeAutotile("Normal", "External angle", "External angle", "Normal")
-        autotilesSurfaces[11] = self._makeAutotile("External angle", "External angle", "External angle", "Normal")
-        autotilesSurfaces[12] = self._makeAutotile("Normal", "Normal", "External angle", "External angle")
-        autotilesSurfaces[13] = self._makeAutotile("External angle", "Normal", "External angle", "External angle")
-        autotilesSurfaces[14] = self._makeAutotile("Normal", "External angle", "External angle", "External angle")
-        autotilesSurfaces[15] = self._makeAutotile("External angle", "External angle", "External angle", "External angle")
-        autotilesSurfaces[16] = self._makeAutotile("VerticalEdge", "Normal", "VerticalEdge", "Normal")
-        autotilesSurfaces[17] = self._makeAutotile("VerticalEdge", "External angle", "VerticalEdge", "Normal")
-        autotilesSurfaces[18] = self._makeAutotile("VerticalEdge", "Normal", "VerticalEdge", "External angle")
-        autotilesSurfaces[19] = self._makeAutotile("VerticalEdge", "External angle", "VerticalEdge", "External angle")
-        autotilesSurfaces[20] = self._makeAutotile("HorizontalEdge", "HorizontalEdge", "Normal", "Normal")
-        autotilesSurfaces[21] = self._makeAutotile("HorizontalEdge", "HorizontalEdge", "Normal", "External angle")
-        autotilesSurfaces[22] = self._makeAutotile("HorizontalEdge", "HorizontalEdge", "External angle", "Normal")
-        autotilesSurfaces[23] = self._makeAutotile("HorizontalEdge", "HorizontalEdge", "External angle", "External angle")
-        autotilesSurfaces[24] = self._makeAutotile("Normal", "VerticalEdge", "Normal", "VerticalEdge")
-        autotilesSurfaces[25] = self._makeAutotile("Normal", "VerticalEdge", "External angle", "VerticalEdge")
-        autotilesSurfaces[26] = self._makeAutotile("External angle", "VerticalEdge", "Normal", "VerticalEdge")
-        autotilesSurfaces[27] = self._makeAutotile("External angle", "VerticalEdge", "External angle", "VerticalEdge")
-        autotilesSurfaces[28] = self._makeAutotile("Normal", "Normal", "HorizontalEdge", "HorizontalEdge")
-        autotilesSurfaces[29] = self._makeAutotile("External angle", "Normal", "HorizontalEdge", "HorizontalEdge")
-        autotilesSurfaces[30] = self._makeAutotile("Normal", "External angle", "HorizontalEdge", "HorizontalEdge")
-        autotilesSurfaces[31] = self._makeAutotile("External angle", "External angle", "HorizontalEdge", "HorizontalEdge")
-        autotilesSurfaces[32] = self._makeAutotile("VerticalEdge", "VerticalEdge", "VerticalEdge", "VerticalEdge")
-        autotilesSurfaces[33] = self._makeAutotile("HorizontalEdge", "HorizontalEdge", "HorizontalEdge", "HorizontalEdge")
-        autotilesSurfaces[34] = self._makeAutotile("Internal angle", "HorizontalEdge", "VerticalEdge", "Normal")
-        autotilesSurfaces[35] = self._makeAutotile("Internal angle", "HorizontalEdge", "VerticalEdge", "External angle")
-        autotilesSurfaces[36] = self._makeAutotile("HorizontalEdge", "Internal angle", "Normal", "VerticalEdge")
-        autotilesSurfaces[37] = self._makeAutotile("HorizontalEdge", "Internal angle", "External angle", "VerticalEdge")
-        autotilesSurfaces[38] = self._makeAutotile("Normal", "VerticalEdge", "HorizontalEdge", "Internal angle")
-        autotilesSurfaces[39] = self._makeAutotile("External angle", "VerticalEdge", "HorizontalEdge", "Internal angle")
-        autotilesSurfaces[40] = self._makeAutotile("VerticalEdge", "Normal", "Internal angle", "HorizontalEdge")
-        autotilesSurfaces[41] = self._makeAutotile("VerticalEdge", "External angle", "Internal angle", "HorizontalEdge")
-        autotilesSurfaces[42] = self._makeAutotile("Showcase", "Showcase", "VerticalEdge", "VerticalEdge")
-        autotilesSurfaces[43] = self._makeAutotile("Showcase", "HorizontalEdge", "Showcase", "HorizontalEdge")
-        autotilesSurfaces[44] = self._makeAutotile("VerticalEdge", "VerticalEdge", "Showcase", "Showcase")
-        autotilesSurfaces[45] = self._makeAutotile("HorizontalEdge", "Showcase", "HorizontalEdge", "Showcase")
-        autotilesSurfaces[46] = self._makeAutotile("Showcase", "Showcase", "Showcase", "Showcase")
-        autotilesSurfaces[47] = self._makeAutotile("Dummy", "Dummy", "Dummy", "Dummy")
-        ##### We make the final surface by blitting our individual surfaces
-        autotileAbs, autotileOrd, i, self._expandedAutotile = 0, 0, 0, ImagePIL.new("RGB", (AutoTilesetImageWidth, AutoTilesetImageHeight))
-        while autotileOrd < AutoTilesetImageHeight:
-            autotileAbs = 0
-            while autotileAbs < AutoTilesetImageWidth:
-                self._expandedAutotile.paste(autotilesSurfaces[i], (autotileAbs, autotileOrd))
-                i += 1
-                autotileAbs += TileSize
-            autotileOrd += TileSize
+    def _getMinitileSources(self):
+        return getMinitileSources()
+
+    def _getGatherPlan(self, bytesPerPixel):
+        return getGatherPlan(bytesPerPixel)
+
+    def _getGatherIndex(self):
+        return getGatherIndex()
+
+    def expandAutotile(self, autotile, indexed=False):
+        """<autotile> is either the filename of the autotile, or the autotile image itself. See expandAutotileImage."""
+        from PIL import Image as ImagePIL
+        if isinstance(autotile, str):
+            autotile = ImagePIL.open(autotile)
+        self._imageAutotile = autotile
+        self._expandedAutotile = expandAutotileImage(autotile, indexed)
         return self._expandedAutotile
+
+    def makeMinitileAtlas(self, autotile, atlasColumns=8, indexed=False):
+        """<autotile> is either the filename of the autotile, or the autotile image itself. See the function makeMinitileAtlas."""
+        from PIL import Image as ImagePIL
+        if isinstance(autotile, str):
+            autotile = ImagePIL.open(autotile)
+        self._minitileAtlas, self._minitileComposition = makeMinitileAtlas(autotile, atlasColumns, indexed)
+        return self._minitileAtlas, self._minitileComposition
+
+    def makeMinitileIndex(self, composition, atlasColumns=8):
+        """Returns the binary composition index: a header followed by the 4 minitile indices of each tile, one byte each."""
+        header = self.MinitileIndexHeader.pack(self.MinitileIndexMagic, self.MinitileIndexVersion, TileSize, MiniTileSize, atlasColumns, max([max(tileComposition) for tileComposition in composition])+1, len(composition))
+        return header + bytes([minitileIndex for tileComposition in composition for minitileIndex in tileComposition])
+
+    def makeMinitileIndexJSON(self, composition, atlasFilename, atlasColumns=8):
+        """Returns the composition index as a JSON document."""
+        description = dict(version=self.MinitileIndexVersion, atlas=atlasFilename, tileSize=TileSize, minitileSize=MiniTileSize, columns=atlasColumns, minitiles=max([max(tileComposition) for tileComposition in composition])+1, corners=["NO", "NE", "SO", "SE"], tiles=composition)
+        return json.dumps(description, indent=1)
+
+    def expandAutotiles(self, autotiles, indexed=False):
+        """See expandAutotileImages."""
+        return expandAutotileImages(autotiles, indexed)
             
     def _checkInputValidity(self):
             try:
-                image = ImagePIL.open(self._inputFilename)
+                self._loadInput()
             except IOError as error:
                 print("The input autotile \"{0}\" is not a valid PNG image. Details:\n{1}".format(self._inputFilename, error))
                 raise SystemExit
+            if self._indexed is True:
+                self._stopOnError(checkIndexedImage, self._loadInput(), self._getInputSubject())
 
     def _checkInputSize(self):
-            image = ImagePIL.open(self._inputFilename)
-            if image.size != (AutotileImageWidth, AutotileImageHeight):
-                print("The input autotile \"{0}\" does not have the right size.\nIt must be {1}x{2} pixels wide. Please extract autotiles from an RPG Maker 200x chipset with this program first.".format(self._inputFilename, AutotileImageWidth, AutotileImageHeight))
-                raise SystemExit
+            self._stopOnError(checkAutotileSize, self._loadInput(), self._getInputSubject())
 
-    def launchScript(self, inputFilename, outputFilename, askConfirmation, verbose, testSteps=["Input exists", "Input validity", "Input size", "Output without extension", "Output already exists"]):
+    def listIndexFilenames(self, outputFilename):
+        """Returns the binary and JSON composition indices written along the minitile atlas <outputFilename>."""
+        return [path.splitext(outputFilename)[0] + extension for extension in (".bin", ".json")]
+
+    def _cacheOptions(self):
+        return dict(outputFormat=self._outputFormat, imageFormat=self._imageFormat, indexed=self._indexed)
+
+    def _cacheOutputs(self):
+        if self._outputFormat == "minitiles":
+            return [self._outputFilename] + self.listIndexFilenames(self._outputFilename)
+        return [self._outputFilename]
+
+    def launchScript(self, inputFilename, outputFilename, askConfirmation, verbose, outputFormat="sheet", imageFormat="png", indexed=False, testSteps=["Input exists", "Input validity", "Input size", "Output without extension", "Output already exists"]):
+        self._outputFormat, self._imageFormat, self._indexed = outputFormat, imageFormat, indexed
         super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
-        self.expandAutotile(self._inputFilename)
-        self._expandedAutotile.save(self._outputFilename, "PNG")
+        if self._upToDate is True:
+            return
+        if outputFormat == "minitiles":
+            atlas, composition = self.makeMinitileAtlas(self._loadInput(), indexed=indexed)
+            atlasFilename = self._outputFilename
+            self._writeImage(atlas, atlasFilename)
+            self._printVerbose("Successfully created the minitile atlas \"{0}\" ({1} minitiles)!".format(atlasFilename, max([max(tileComposition) for tileComposition in composition])+1))
+            binaryIndexFilename, jsonIndexFilename = self.listIndexFilenames(atlasFilename)
+            self._outputFilename = binaryIndexFilename
+            self._checkArguments("Output already exists")
+            writeOutput(binaryIndexFilename, self.makeMinitileIndex(composition))
+            self._outputFilename = jsonIndexFilename
+            self._checkArguments("Output already exists")
+            writeOutput(jsonIndexFilename, self.makeMinitileIndexJSON(composition, path.basename(atlasFilename)), "w")
+            self._printVerbose("Successfully created the composition indices \"{0}\" and \"{1}\"!".format(binaryIndexFilename, jsonIndexFilename))
+            self._outputFilename = atlasFilename
+            self._recordCache()
+            return
+        self.expandAutotile(self._loadInput(), indexed=indexed)
+        self._writeImage(self._expandedAutotile, self._outputFilename)
         self._printVerbose("Successfully created the autotile \"{0}\"!".format(self._outputFilename))
+        self._recordCache()
 
 class TilesetGenerator(Script):
 
     def _checkInputValidity(self):
             try:
-                image = ImagePIL.open(self._inputFilename)
+                self._loadInput()
             except IOError as error:
                 print("The input expanded autotile \"{0}\" is not a valid PNG image. Details:\n{1}".format(self._inputFilename, error))
                 raise SystemExit
 
     def _checkInputSize(self):
-            image = ImagePIL.open(self._inputFilename)
-            if image.size != (AutoTilesetImageWidth, AutoTilesetImageHeight):
+            if self._loadInput().size != (AutoTilesetImageWidth, AutoTilesetImageHeight):
                 print("The input expanded autotile \"{0}\" does not have the right size.\nIt must be {1}x{2} pixels wide. Please expand an autotile from RPG Maker 200x with this program first.".format(self._inputFilename, AutoTilesetImageWidth, AutoTilesetImageHeight))
                 raise SystemExit
 
-    def makeXML(self, inputFilename, outputFilename="Tileset"):
+    def _makeWangSet(self, tilesetXML, tilesetName):
+        """Adds a Wang set to the tileset, so that the terrain brush of Tiled places the right tiles of the expanded autotile by itself.
+        The edges of a tile have the color of the terrain when the neighbour on that side is terrain, its corners when the three cells around the corner are."""
+        import xml.etree.ElementTree
+        from autotileresolver import makeNeighbourTable
+        wangIds, neighbourTable = dict(), makeNeighbourTable()
+        for neighbourMask in range(256):
+            north, northEast, east, southEast, south, southWest, west, northWest = [neighbourMask & bit != 0 for bit in (1, 2, 4, 8, 16, 32, 64, 128)]
+            wangIds.setdefault(neighbourTable[neighbourMask], (north, north and east and northEast, east, south and east and southEast, south, south and west and southWest, west, north and west and northWest))
+        wangSetsXML = xml.etree.ElementTree.SubElement(tilesetXML, "wangsets")
+        wangSetXML = xml.etree.ElementTree.SubElement(wangSetsXML, "wangset", dict(name=tilesetName, type="mixed", tile=str(neighbourTable[255])))
+        xml.etree.ElementTree.SubElement(wangSetXML, "wangcolor", dict(name=tilesetName, color="#ff0000", tile=str(neighbourTable[255]), probability="1"))
+        for tileId in sorted(wangIds.keys()):
+            if any(wangIds[tileId]) is True: #The tile of an isolated cell has no color on its sides, so Tiled cannot tell it from an empty cell
+                xml.etree.ElementTree.SubElement(wangSetXML, "wangtile", dict(tileid=str(tileId), wangid=",".join(["1" if side else "0" for side in wangIds[tileId]])))
+
+    def makeXML(self, inputFilename, outputFilename="Tileset", wangSet=False):
+        """Returns the tileset of the expanded autotile <inputFilename>. With <wangSet>, the tileset also describes its tiles for the terrain brush of Tiled."""
+        import xml.etree.ElementTree
+        from xmlstream import StreamedDocument
         self._inputFilename = inputFilename
-        mainXML = xml.dom.minidom.getDOMImplementation().createDocument(None, "tileset", None)
-        tilesetXML = mainXML.documentElement
+        tilesetXML = xml.etree.ElementTree.Element("tileset")
         tilesetName = path.basename(outputFilename)
         if tilesetName.lower().endswith(".tsx") is True:
             tilesetName = tilesetName[: len(tilesetName) - 4]
-        tilesetXML.setAttribute("name", tilesetName)
-        tilesetXML.setAttribute("tilewidth", str(TileSize))
-        tilesetXML.setAttribute("tileheight", str(TileSize))
-        imageXML = mainXML.createElement("image")
-        imageXML.setAttribute("source", self._inputFilename)
-        imageXML.setAttribute("trans", "ffffff")
+        tilesetXML.set("name", tilesetName)
+        tilesetXML.set("tilewidth", str(TileSize))
+        tilesetXML.set("tileheight", str(TileSize))
+        imageXML = xml.etree.ElementTree.SubElement(tilesetXML, "image")
+        imageXML.set("source", self._inputFilename)
+        imageXML.set("trans", "ffffff")
         width, height = AutoTilesetImageWidth, AutoTilesetImageHeight
-        imageXML.setAttribute("width", str(width))
-        imageXML.setAttribute("height", str(height))
-        tilesetXML.appendChild(imageXML)
-        return mainXML
+        imageXML.set("width", str(width))
+        imageXML.set("height", str(height))
+        if wangSet is True:
+            self._makeWangSet(tilesetXML, tilesetName)
+        return StreamedDocument(lambda writer: writer.writeElement(tilesetXML), documentElement=tilesetXML)
 
-    def launchScript(self, inputFilename, outputFilename, relativePath, askConfirmation, verbose, testSteps=["Input exists", "Input validity", "Input size", "Output without extension", "Output already exists"]):
-        super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
+    def makeImageSource(self, imageFilename, tilesetFilename, relativePath):
+        """Returns the path to the image written in the tileset, either absolute or relative to the tileset."""
         if relativePath is True:
-            self._inputFilename = path.relpath(path.abspath(self._inputFilename), path.dirname(path.abspath(self._outputFilename))).replace("\\", "/")
-        else:
-            self._inputFilename = path.abspath(self._inputFilename).replace("\\", "/")
-        xmlData = self.makeXML(self._inputFilename, outputFilename=outputFilename)
-        with open(self._outputFilename, "w") as outputFile:
-            xmlData.writexml(outputFile, addindent="  ", newl="\n", encoding="UTF-8")
+            return path.relpath(path.abspath(imageFilename), path.dirname(path.abspath(tilesetFilename))).replace("\\", "/")
+        return path.abspath(imageFilename).replace("\\", "/")
+
+    def _cacheOptions(self):
+        return dict(relativePath=self._relativePath, wangSet=self._wangSet, inputFilename=path.abspath(self._inputFilename))
+
+    def launchScript(self, inputFilename, outputFilename, relativePath, askConfirmation, verbose, wangSet=False, testSteps=["Input exists", "Input validity", "Input size", "Output without extension", "Output already exists"]):
+        self._relativePath, self._wangSet = relativePath, wangSet
+        super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
+        if self._upToDate is True:
+            return
+        self._inputFilename = self.makeImageSource(self._inputFilename, self._outputFilename, relativePath)
+        with stage("build xml"):
+            xmlData = self.makeXML(self._inputFilename, outputFilename=outputFilename, wangSet=wangSet)
+        writeDocument(self._outputFilename, xmlData)
         xmlData.unlink()
+        self._recordCache()
 
 class RuleMaker(Script):
+    #The layers are shared by every rule maker, even in other threads: they are computed under the lock, and only once
+    _layerTemplates, _layerPayloads, _layerLock = dict(), dict(), threading.RLock()
+
+    def _openInput(self, inputSource):
+        import xml.etree.ElementTree
+        return xml.etree.ElementTree.parse(inputSource).getroot()
 
     def _checkInputValidity(self):
         try:
-            tilesetConfig = xml.dom.minidom.parse(self._inputFilename)
-            tilesetXML = tilesetConfig.documentElement
+            self._loadInput()
         except Exception as error:
             print("An error was encountered while loading the tileset {0}. Details:\n{1}".format(self._inputFilename,error))
             raise SystemExit
 
     def _loadTileset(self):
-        self._tilesetConfig = xml.dom.minidom.parse(self._inputFilename)
-        self._tilesetXML = self._tilesetConfig.documentElement
-        self._tilesetXML.setAttribute("firstgid", "1")
-        self._ruleConfig = xml.dom.getDOMImplementation().createDocument(None, "map", None)
-        self._ruleXML = self._ruleConfig.documentElement
-        self._ruleXML.setAttribute("version", "1.0")
-        self._ruleXML.setAttribute("orientation", "orthogonal")
-        self._ruleXML.setAttribute("width", "32")
-        self._ruleXML.setAttribute("height", "24")
-        self._ruleXML.setAttribute("tilewidth", str(TileSize))
-        self._ruleXML.setAttribute("tileheight", str(TileSize))
-        self._ruleXML.appendChild(self._tilesetXML)
+        self._tilesetXML = self._loadInput()
+        self._tilesetXML.set("firstgid", "1")
+        self._ruleAttributes = [("version", "1.0"), ("orientation", "orthogonal"), ("width", "32"), ("height", "24"), ("tilewidth", str(TileSize)), ("tileheight", str(TileSize))]
     
     def _defineTilesContents(self):
         self._layerTiles, i = {"regions": dict(), "input_" + self._mapLayer: dict()}, 0
@@ -679,9 +1126,10 @@ class RuleMaker(Script):
             gid = 0
         return gid
 
-    def _makeLayerTiles(self, layerData, layerName):
+    def _computeLayerCells(self, layerName):
+        import array, tiledcodec
         x, y, groupX, groupY, separationLineX, groupId = 0, 0, 0, 0, 0, 0
-        dataArray = array.array('l')
+        dataArray = array.array(tiledcodec.CellTypecode)
         while y < 24:
             if groupY < 3:
                 x, lineX = 0, 0
@@ -712,8 +1160,43 @@ class RuleMaker(Script):
                 groupY = -1
             y += 1
             groupY += 1
-        data = base64.b64encode(zlib.compress(dataArray))
-        layerData.appendChild(self._ruleConfig.createTextNode(data.decode()))
+        return dataArray
+
+    def _getLayerTemplate(self, layerKind):
+        """Returns the raw cells of a kind of layer, computed only once. The full tiles of the input layer template have the gid 1."""
+        layerTemplate = RuleMaker._layerTemplates.get(layerKind)
+        if layerTemplate is None:
+            with RuleMaker._layerLock:
+                layerTemplate = RuleMaker._layerTemplates.get(layerKind)
+                if layerTemplate is None:
+                    currentGid, self._inputLayerTileCurrentGid = self._inputLayerTileCurrentGid, 1
+                    layerName = layerKind if layerKind == "regions" else layerKind + "_" + self._mapLayer
+                    layerTemplate = RuleMaker._layerTemplates[layerKind] = self._computeLayerCells(layerName).tobytes()
+                    self._inputLayerTileCurrentGid = currentGid
+        return layerTemplate
+
+    def _makeLayerTiles(self, layerName):
+        """Returns the encoded data of a layer. Each payload is only encoded once, then reused by every layer and every rule which needs it.
+        The 47 input layers only differ by the gid of their full tiles, so their cells are made by substituting the gid in the template."""
+        import tiledcodec
+        if layerName == "regions":
+            payloadKey = ("regions",)
+        elif layerName == "output_" + self._mapLayer:
+            payloadKey = ("output",)
+        else:
+            payloadKey = ("input", self._inputLayerTileCurrentGid)
+        layerPayload = RuleMaker._layerPayloads.get(payloadKey)
+        if layerPayload is None:
+            with RuleMaker._layerLock:
+                layerPayload = RuleMaker._layerPayloads.get(payloadKey)
+                if layerPayload is None:
+                    if payloadKey[0] == "input":
+                        #The template only contains the values 0 and 1, in cells of 4 bytes: turning the bytes 1 into the gid changes the value of the full cells only
+                        layerCells = self._getLayerTemplate("input").translate(bytes.maketrans(b"\x01", bytes([self._inputLayerTileCurrentGid])))
+                    else:
+                        layerCells = self._getLayerTemplate(payloadKey[0])
+                    layerPayload = RuleMaker._layerPayloads[payloadKey] = tiledcodec.encodeCells(layerCells, "base64", "zlib")
+        return layerPayload
 
     def _convertLayerNameVersion08(self, layerName):
         if layerName == "RuleRegion":
@@ -725,37 +1208,40 @@ class RuleMaker(Script):
         return layerName
 
     def makeRule(self):
+        from xmlstream import StreamedDocument
         # IB: Exclude dummy tile 48 from rules.
         # Mapper must fill layer with dummy tile before drawing,
         # to work around https://github.com/bjorn/tiled/issues/1520
         # "Sometimes, having an empty tile in the rule file makes the match fails."
+        # The rule is only generated when it is written, one layer at a time
+        return StreamedDocument(self._writeRule)
+
+    def _writeRule(self, writer):
         if self._version08 is False: #Tiled 0.9 style
             layers = ["regions"] +  ["input_"+self._mapLayer]*47 + ["output_"+self._mapLayer]
         else: #Tiled 0.8 style
             layers = ["RuleRegion"] + ["RuleSet"]*47 + ["Rule_"+self._mapLayer]
-        i = 0
+        writer.startElement("map", self._ruleAttributes)
+        writer.writeElement(self._tilesetXML)
+        self._inputLayerTileCurrentGid, i = 1, 0
         while i < len(layers):
-            layer = self._ruleConfig.createElement("layer")
-            layer.setAttribute("name", layers[i])
-            layer.setAttribute("width", "32")
-            layer.setAttribute("height", "24")
-            layerData = self._ruleConfig.createElement("data")
-            layerData.setAttribute("encoding", "base64")
-            layerData.setAttribute("compression", "zlib")
-            layers[i] = self._convertLayerNameVersion08(layers[i]) #Once the layers have been created, we must convert the ones in 0.8 style into layers in 0.9 style, so that they work with the rest of the program
-            self._makeLayerTiles(layerData, layers[i])
-            layer.appendChild(layerData)
-            self._ruleXML.appendChild(layer)
+            writer.startElement("layer", [("name", layers[i]), ("width", "32"), ("height", "24")])
+            layers[i] = self._convertLayerNameVersion08(layers[i]) #Once the layers have been named, we must convert the ones in 0.8 style into layers in 0.9 style, so that they work with the rest of the program
+            writer.element("data", [("encoding", "base64"), ("compression", "zlib")], self._makeLayerTiles(layers[i]))
+            writer.endElement()
             if layers[i] != "regions":
                 self._inputLayerTileCurrentGid += 1
             if self._inputLayerTileCurrentGid == 48:
                 self._inputLayerTileCurrentGid = 1
             i += 1
-        return self._ruleConfig
+        writer.endElement()
 
-    def initializeEverything(self, inputFilename="", mapLayer="", version08=""):
+    def initializeEverything(self, inputFilename="", mapLayer="", version08="", tilesetConfig=None):
+        """<tilesetConfig> is an already loaded tileset element, used instead of loading <inputFilename>."""
         if inputFilename != "":
-            self._inputFilename = inputFilename.replace("\\", "/")
+            self._inputFilename, self._input = inputFilename.replace("\\", "/"), None
+        if tilesetConfig is not None:
+            self._input = tilesetConfig
         if mapLayer != "":
             self._mapLayer = mapLayer
         if version08 != "":
@@ -765,58 +1251,561 @@ class RuleMaker(Script):
         self._inputLayerTileCurrentGid = 1
 
     def unlinkOtherData(self):
-        self._ruleConfig.unlink()
-        self._tilesetConfig.unlink()
+        self._tilesetXML, self._input = None, None
+
+    def _cacheOptions(self):
+        return dict(mapLayer=self._mapLayer, version08=self._version08)
 
     def launchScript(self, inputFilename, outputFilename, mapLayer, version08, askConfirmation, verbose, testSteps=["Input exists", "Input validity", "Output without extension", "Output already exists"]):
-        super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
         self._mapLayer, self._version08 = mapLayer, version08
-        self.initializeEverything()
-        xmlData = self.makeRule()
-        with open(self._outputFilename, "w") as outputFile:
-            xmlData.writexml(outputFile, addindent="  ", newl="\n", encoding="UTF-8")
+        super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
+        if self._upToDate is True:
+            return
+        with stage("build xml"):
+            self.initializeEverything()
+            xmlData = self.makeRule()
+        writeDocument(self._outputFilename, xmlData)
         xmlData.unlink()
         self.unlinkOtherData()
+        self._recordCache()
 
-if __name__ == "__main__":
+class RuleSetMaker:
+    """Makes the automapping rules of several tilesets and map layers in one go, and the rules.txt file listing them for Tiled.
+    The encoded layers are shared by all the rules."""
+    _cache = None
+
+    def setCache(self, cache):
+        self._cache = cache
+
+    def _makeNamePart(self, name):
+        return "".join([character if character.isalnum() or character in "-_" else "_" for character in name])
+
+    def listOutputFilenames(self, inputTilesets, outputRule, mapLayers):
+        """Returns the rule made for each pair of tileset and map layer. With only one pair, the rule is <outputRule> itself."""
+        if len(inputTilesets) == 1 and len(mapLayers) == 1:
+            return [(inputTilesets[0], mapLayers[0], outputRule)]
+        outputPrefix = outputRule[:-4] if outputRule.lower().endswith(".tmx") else outputRule
+        outputFilenames = []
+        for inputTileset in inputTilesets:
+            for mapLayer in mapLayers:
+                nameParts = [outputPrefix]
+                if len(inputTilesets) > 1:
+                    nameParts.append(self._makeNamePart(path.splitext(path.basename(inputTileset))[0]))
+                if len(mapLayers) > 1:
+                    nameParts.append(self._makeNamePart(mapLayer))
+                outputFilenames.append((inputTileset, mapLayer, "_".join(nameParts) + ".tmx"))
+        return outputFilenames
+
+    def launchScript(self, inputTilesets, outputRule, mapLayers, version08, askConfirmation, verbose, indexFilename=None):
+        """Writes the rules.txt file <indexFilename> too. By default, it is written next to the rules when there are several of them."""
+        outputFilenames = self.listOutputFilenames(inputTilesets, outputRule, mapLayers)
+        if len(set([outputFilename for inputTileset, mapLayer, outputFilename in outputFilenames])) != len(outputFilenames):
+            print("Several rules would have the same name. Please give different names to the tilesets and the map layers.")
+            raise SystemExit
+        for inputTileset, mapLayer, outputFilename in outputFilenames:
+            ruleMaker = RuleMaker("automapping rule", ".tmx")
+            ruleMaker.setCache(self._cache)
+            ruleMaker.launchScript(inputTileset, outputFilename, mapLayer, version08, askConfirmation, verbose, testSteps=["Input exists", "Input validity", "Output already exists"])
+            if verbose is True and ruleMaker._upToDate is False:
+                print("Successfully created the automapping rule \"{0}\" for the layer \"{1}\"!".format(outputFilename, mapLayer))
+        if indexFilename is None and len(outputFilenames) > 1:
+            indexFilename = path.join(path.dirname(outputRule), "rules.txt")
+        if indexFilename is not None:
+            if path.exists(indexFilename) is True and askConfirmation is True:
+                answerIgnoreExistingOutput = Interacter().askString("The list of rules \"{0}\" already exists. Do you want to overwrite it? (y/N)".format(indexFilename))
+                if answerIgnoreExistingOutput.lower().split(" ")[0] != "y":
+                    print("Correct, I'm stopping here.")
+                    raise SystemExit
+            indexDirectory = path.dirname(path.abspath(indexFilename))
+            with open(indexFilename, "w") as indexFile:
+                for inputTileset, mapLayer, outputFilename in outputFilenames:
+                    indexFile.write(path.relpath(path.abspath(outputFilename), indexDirectory).replace("\\", "/") + "\n")
+            if verbose is True:
+                print("Successfully created the list of rules \"{0}\"!".format(indexFilename))
+
+class MapAutotiler(Script):
+    """Autotiles the layers of a map for Tiled directly, instead of using the automapping rules in Tiled.
+    Every tileset of the map made from an expanded autotile is considered: the cells using one of its tiles are its terrain, and get the tile matching their neighbours."""
+    _gidFlags = 0xF0000000 #The highest bits of a gid tell whether the tile is flipped or rotated
+
+    def _openInput(self, inputSource):
+        import xml.etree.ElementTree
+        return xml.etree.ElementTree.parse(inputSource)
+
+    def _checkInputValidity(self):
+        try:
+            mapTree = self._loadInput()
+        except Exception as error:
+            print("An error was encountered while loading the map {0}. Details:\n{1}".format(self._inputFilename, error))
+            raise SystemExit
+        if mapTree.getroot().tag != "map":
+            print("The input map \"{0}\" is not a map for Tiled.".format(self._inputFilename))
+            raise SystemExit
+
+    def _findAutotileTilesets(self, mapXML, tilesetNames, mapDirectory, subject):
+        """Returns the first gid of the tilesets of expanded autotiles, optionally only the ones named in <tilesetNames>.
+        The external tilesets are read relatively to <mapDirectory>."""
+        import xml.etree.ElementTree
+        firstGids = []
+        for tilesetXML in mapXML.findall("tileset"):
+            firstGid = int(tilesetXML.get("firstgid"))
+            if tilesetXML.get("source") is not None:
+                try:
+                    tilesetXML = xml.etree.ElementTree.parse(path.join(mapDirectory, tilesetXML.get("source"))).getroot()
+                except (OSError, xml.etree.ElementTree.ParseError) as error:
+                    raise InvalidMapError("The tileset \"{0}\" of {1} could not be read. Details:\n{2}".format(tilesetXML.get("source"), subject[0].lower() + subject[1:], error))
+            imageXML = tilesetXML.find("image")
+            tileCount = tilesetXML.get("tilecount")
+            if tileCount is None and imageXML is not None:
+                tileCount = (int(imageXML.get("width")) // int(tilesetXML.get("tilewidth"))) * (int(imageXML.get("height")) // int(tilesetXML.get("tileheight")))
+            if tilesetNames is not None and tilesetXML.get("name") in tilesetNames:
+                firstGids.append(firstGid)
+            elif tilesetNames is None and tileCount is not None and int(tileCount) == len(ExpandedAutotileTypes):
+                firstGids.append(firstGid)
+        return firstGids
+
+    def _autotileCells(self, gids, firstGids, outsideIsTerrain):
+        """Autotiles the 2D array of gids in place with the terrain of each tileset, and returns the number of cells which changed."""
+        import numpy
+        from autotileresolver import AutotileResolver
+        changedCells, tileIds = 0, gids & ~numpy.uint32(self._gidFlags)
+        for firstGid in firstGids:
+            terrain = (tileIds >= firstGid) & (tileIds < firstGid + len(ExpandedAutotileTypes) - 1) #The dummy tile is not terrain
+            newGids = numpy.uint32(firstGid) + AutotileResolver(emptyIndex=0, outsideIsTerrain=outsideIsTerrain).resolve(terrain).astype(numpy.uint32)
+            changedCells += int(numpy.count_nonzero(terrain & (gids != newGids)))
+            gids[terrain] = newGids[terrain]
+        return changedCells
+
+    def _autotileLayer(self, layerXML, firstGids, outsideIsTerrain):
+        import numpy, tiledcodec
+        dataXML = layerXML.find("data")
+        chunksXML = dataXML.findall("chunk")
+        if len(chunksXML) == 0:
+            width, height = int(layerXML.get("width")), int(layerXML.get("height"))
+            gids = numpy.frombuffer(tiledcodec.readData(dataXML, cellCount=width*height), dtype=numpy.uint32).reshape(height, width)
+            with stage("resolve"):
+                changedCells = self._autotileCells(gids, firstGids, outsideIsTerrain)
+            if changedCells > 0:
+                dataXML.text = tiledcodec.writeData(dataXML, gids, width)
+            return changedCells
+        #An infinite map is made of chunks: they are put together so that the cells along their edges see their neighbours in the other chunks
+        chunks = [(int(chunkXML.get("x")), int(chunkXML.get("y")), int(chunkXML.get("width")), int(chunkXML.get("height")), chunkXML) for chunkXML in chunksXML]
+        left, top = min([chunk[0] for chunk in chunks]), min([chunk[1] for chunk in chunks])
+        right, bottom = max([chunk[0]+chunk[2] for chunk in chunks]), max([chunk[1]+chunk[3] for chunk in chunks])
+        gids = numpy.zeros((bottom-top, right-left), dtype=numpy.uint32)
+        for chunkAbs, chunkOrd, chunkWidth, chunkHeight, chunkXML in chunks:
+            chunkGids = numpy.frombuffer(tiledcodec.readData(dataXML, chunkXML.text or "", chunkWidth*chunkHeight), dtype=numpy.uint32).reshape(chunkHeight, chunkWidth)
+            gids[chunkOrd-top:chunkOrd-top+chunkHeight, chunkAbs-left:chunkAbs-left+chunkWidth] = chunkGids
+        with stage("resolve"):
+            changedCells = self._autotileCells(gids, firstGids, outsideIsTerrain)
+        if changedCells > 0:
+            for chunkAbs, chunkOrd, chunkWidth, chunkHeight, chunkXML in chunks:
+                chunkGids = gids[chunkOrd-top:chunkOrd-top+chunkHeight, chunkAbs-left:chunkAbs-left+chunkWidth]
+                chunkXML.text = tiledcodec.writeData(dataXML, numpy.ascontiguousarray(chunkGids), chunkWidth)
+        return changedCells
+
+    def autotileMap(self, mapTree, tilesetNames=None, mapLayers=None, outsideIsTerrain=False, mapDirectory=".", subject="The map"):
+        """Autotiles the tile layers of the map, or only the ones named in <mapLayers>. Returns the number of cells which changed.
+        Raises an InvalidMapError when the map cannot be autotiled."""
+        mapXML = mapTree.getroot()
+        if mapXML.tag != "map":
+            raise InvalidMapError("{0} is not a map for Tiled.".format(subject))
+        try:
+            firstGids = self._findAutotileTilesets(mapXML, tilesetNames, mapDirectory, subject)
+        except (TypeError, ValueError) as error: #A missing or wrong attribute
+            raise InvalidMapError("The tilesets of {0} are not valid. Details:\n{1}".format(subject[0].lower() + subject[1:], error))
+        if len(firstGids) == 0:
+            raise InvalidMapError("{0} does not use any tileset made from an expanded autotile.".format(subject))
+        changedCells = 0
+        for layerXML in mapXML.iter("layer"):
+            if mapLayers is None or layerXML.get("name") in mapLayers:
+                try:
+                    changedCells += self._autotileLayer(layerXML, firstGids, outsideIsTerrain)
+                except (TypeError, ValueError, AttributeError) as error: #A missing or wrong attribute or element
+                    raise InvalidMapError("The layer \"{0}\" of {1} could not be autotiled. Details:\n{2}".format(layerXML.get("name"), subject[0].lower() + subject[1:], error))
+        return changedCells
+
+    def launchScript(self, inputFilename, outputFilename, tilesetNames, mapLayers, outsideIsTerrain, askConfirmation, verbose, testSteps=["Input exists", "Input validity", "Output without extension", "Output already exists"]):
+        super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
+        mapTree = self._loadInput()
+        changedCells = self._stopOnError(self.autotileMap, mapTree, tilesetNames, mapLayers, outsideIsTerrain, path.dirname(self._inputFilename), self._getInputSubject())
+        with stage("write xml") as record:
+            mapTree.write(self._outputFilename, encoding="UTF-8", xml_declaration=True)
+            record.bytesWritten = path.getsize(self._outputFilename)
+        self._printVerbose("Successfully autotiled the map \"{0}\": {1} cells changed.".format(self._outputFilename, changedCells))
+
+class PaletteRecolorer(Script):
+    """Makes color variants of indexed images, such as expanded autotiles, by changing their palette only: the pixels are neither decoded to colors nor touched.
+    A remap file is a JSON object whose keys are the names of the variants. Each variant maps colors ("rrggbb") or palette indices ("i12") to new colors ("rrggbb")."""
+
+    def loadRemaps(self, remapFilename):
+        """Returns the list of the (name, remap) of the variants in the remap file, in the order of the file."""
+        try:
+            with open(remapFilename) as remapFile:
+                variants = json.load(remapFile)
+            remaps = []
+            for variantName, colorRemap in variants.items():
+                remap = []
+                for source, targetColor in colorRemap.items():
+                    remap.append(self.parseRemapSource(source) + (parseColor(targetColor),))
+                remaps.append((variantName, remap))
+        except (OSError, ValueError, AttributeError) as error:
+            print("The remap file \"{0}\" could not be read. It must be a JSON object mapping each variant name to an object mapping colors or palette indices to colors. Details:\n{1}".format(remapFilename, error))
+            raise SystemExit
+        return remaps
+
+    def parseRemapSource(self, source):
+        """Returns the (palette index, color) of a source of a remap: "i12" is the palette index 12, anything else is a color in the rrggbb format."""
+        if source[:1].lower() != "i":
+            return None, parseColor(source)
+        if source[1:].isdigit() is False or int(source[1:]) > 255:
+            raise ValueError("\"{0}\" is not a palette index between i0 and i255.".format(source))
+        return int(source[1:]), None
+
+    def remapPalette(self, palette, remap):
+        """Returns a copy of <palette>, a flat list of RGB values, in which the colors of <remap> are replaced.
+        The colors are matched against the original palette, so a remap can swap colors."""
+        remappedPalette = list(palette)
+        for i in range(len(palette) // 3):
+            for sourceIndex, sourceColor, targetColor in remap:
+                if sourceIndex == i or (sourceColor is not None and tuple(palette[i*3:i*3+3]) == sourceColor):
+                    remappedPalette[i*3:i*3+3] = targetColor
+        return remappedPalette
+
+    def makeVariants(self, image, remaps):
+        """Returns the (name, image) of each variant of the "P" image <image>. The variants share the pixels of <image>, and only get their own palette."""
+        palette, variants = image.getpalette("RGB"), []
+        for variantName, remap in remaps:
+            variant = image.copy()
+            variant.putpalette(self.remapPalette(palette, remap))
+            variants.append((variantName, variant))
+        return variants
+
+    def _checkInputValidity(self):
+        try:
+            self._loadInput()
+        except IOError as error:
+            print("The input image \"{0}\" is not a valid PNG image. Details:\n{1}".format(self._inputFilename, error))
+            raise SystemExit
+        if self._loadInput().mode != "P":
+            print("The input image \"{0}\" is not an indexed image, so it has no palette to change. Extract and expand it with the indexed option.".format(self._inputFilename))
+            raise SystemExit
+
+    def listOutputFilenames(self, outputFilenamePrefix, remaps):
+        return ["{0}_{1}{2}".format(outputFilenamePrefix, variantName, self._outputFileExtension) for variantName, remap in remaps]
+
+    def _cacheOptions(self):
+        return dict(remaps=self._remaps)
+
+    def _cacheOutputs(self):
+        return self.listOutputFilenames(self._outputFilename, self._remaps)
+
+    def launchScript(self, inputFilename, outputFilename, remaps, askConfirmation, verbose, testSteps=["Input exists", "Input validity"]):
+        """Writes the variants of <inputFilename> as <outputFilename>_<variant name>.png."""
+        self._remaps = remaps
+        super().launchScript(inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
+        if self._upToDate is True:
+            return
+        outputFilenamePrefix = self._outputFilename
+        with stage("recolor"):
+            variants = self.makeVariants(self._loadInput(), remaps)
+        for (variantName, variant), outputFilename in zip(variants, self.listOutputFilenames(outputFilenamePrefix, remaps)):
+            self._outputFilename = outputFilename
+            self._saveImage(variant, "{0} variant".format(variantName))
+        self._outputFilename = outputFilenamePrefix
+        self._recordCache()
+
+    def launchBatch(self, sources, remapFilename, outputDirectory, askConfirmation, verbose):
+        """Makes every variant of every image of <sources>, each image being read once. The variants are written next to their image, or in <outputDirectory>."""
+        inputFilenames, remaps = collectFiles(sources, ".png"), self.loadRemaps(remapFilename)
+        if len(inputFilenames) == 0:
+            print("No image was found to recolor.")
+            raise SystemExit(1)
+        if outputDirectory is not None:
+            os.makedirs(outputDirectory, exist_ok=True)
+        for inputFilename in inputFilenames:
+            outputFilenamePrefix = path.splitext(inputFilename)[0]
+            if outputDirectory is not None:
+                outputFilenamePrefix = path.join(outputDirectory, path.basename(outputFilenamePrefix))
+            self.launchScript(inputFilename, outputFilenamePrefix, remaps, askConfirmation, verbose)
+        self._printVerbose("Made {0} variants of {1} images.".format(len(remaps), len(inputFilenames)))
+
+class ChipsetBuilder(TileExtractor):
+    """Converts a chipset into expanded autotiles, tilesets and automapping rules in one go.
+    The autotiles are passed from one step to the next in memory: only the final files are written."""
+
+    def _saveXML(self, xmlData):
+        writeDocument(self._outputFilename, xmlData)
+
+    def _cacheOptions(self):
+        return dict(keyColors=self._extraKeyColors, keyTolerance=self._keyTolerance, mapLayer=self._mapLayer, version08=self._version08, relativePath=self._relativePath, wangSet=self._wangSet, indexed=self._indexed)
+
+    def _cacheOutputs(self):
+        outputFilenames = [outputFilename for outputFilename in self.listOutputFilenames(self._outputFilename) if "_at" not in outputFilename[len(self._outputFilename):]]
+        for i in range(len(self._autotilePositions)):
+            outputFilenames += ["{0}_at{1}{2}".format(self._outputFilename, i, extension) for extension in (".png", ".tsx", ".tmx")]
+        return outputFilenames
+
+    def launchScript(self, inputFilename, outputFilename, mapLayer, version08, relativePath, askConfirmation, verbose, keyColors=[], keyTolerance=0, wangSet=False, indexed=False, testSteps=["Input exists", "Input validity", "Input size"]):
+        self._extraKeyColors, self._keyTolerance, self._mapLayer, self._version08, self._relativePath, self._wangSet, self._indexed = list(keyColors), keyTolerance, mapLayer, version08, relativePath, wangSet, indexed
+        self._initializeLocations()
+        Script.launchScript(self, inputFilename, outputFilename, askConfirmation, verbose, testSteps=testSteps)
+        if self._upToDate is True:
+            return
+        self.extractTiles(self._loadInput())
+        outputFilenamePrefix = self._outputFilename
+        extractedTiles = [("water tile", "_w{0}".format(i), tile) for i, tile in enumerate(self._waterTiles)]
+        extractedTiles += [("anim tile", "_an", tile) for tile in self._animTiles]
+        extractedTiles += [("low deco tile", "_lo", self._lowTiles), ("high deco tile", "_hi", self._highTiles)]
+        for description, suffix, tile in extractedTiles:
+            self._outputFilename = "{0}{1}.png".format(outputFilenamePrefix, suffix)
+            self._saveImage(tile, description)
+        expandedAutotiles = AutotileExpander("autotile", ".png").expandAutotiles(self._autotiles, indexed=indexed)
+        tilesetGenerator, ruleMaker = TilesetGenerator("expanded autotile", ".tsx"), RuleMaker("automapping rule", ".tmx")
+        for i, expandedAutotile in enumerate(expandedAutotiles):
+            autotilePrefix = "{0}_at{1}".format(outputFilenamePrefix, i)
+            imageFilename = self._outputFilename = autotilePrefix + ".png"
+            self._saveImage(expandedAutotile, "expanded autotile")
+            self._outputFilename = autotilePrefix + ".tsx"
+            self._checkArguments("Output already exists")
+            with stage("build xml"):
+                tilesetXML = tilesetGenerator.makeXML(tilesetGenerator.makeImageSource(imageFilename, self._outputFilename, relativePath), outputFilename=self._outputFilename, wangSet=wangSet)
+            self._saveXML(tilesetXML)
+            self._printVerbose("Successfully created the tileset \"{0}\"!".format(self._outputFilename))
+            self._outputFilename = autotilePrefix + ".tmx"
+            self._checkArguments("Output already exists")
+            with stage("build xml"):
+                ruleMaker.initializeEverything(mapLayer=mapLayer, version08=version08, tilesetConfig=tilesetXML.documentElement)
+                ruleXML = ruleMaker.makeRule()
+            self._saveXML(ruleXML)
+            ruleXML.unlink()
+            ruleMaker.unlinkOtherData()
+            self._printVerbose("Successfully created the automapping rule \"{0}\"!".format(self._outputFilename))
+        self._recordCache()
+
+class AtlasBuilder(TileExtractor):
+    """Extracts the tiles of many chipsets and packs all the groups of tiles into a few power-of-two texture atlases, described by a JSON manifest.
+    Each group is named after its chipset and its suffix in the extractor outputs, for instance "chipset_at0"."""
+
+    def listOutputFilenames(self, outputFilenamePrefix, atlasCount=1):
+        return ["{0}_{1}{2}".format(outputFilenamePrefix, i, self._outputFileExtension) for i in range(atlasCount)] + [outputFilenamePrefix + ".json"]
+
+    def _collectGroups(self, inputChipsets, expand):
+        autotileExpander, groups, groupChipsets = AutotileExpander("autotile", ".png"), [], dict()
+        for inputChipset in inputChipsets:
+            Script.launchScript(self, inputChipset, self._outputPrefix, self._askConfirmation, self._verbose, testSteps=["Input exists", "Input validity", "Input size"])
+            self._initializeLocations()
+            self.extractTiles(self._loadInput())
+            chipsetName = path.splitext(path.basename(self._inputFilename))[0]
+            for description, suffix, tile in self.listExtractedTiles():
+                groupName = chipsetName + suffix
+                if groupName in groupChipsets:
+                    print("The chipsets \"{0}\" and \"{1}\" have the same name, so their tiles cannot be told apart in the atlas.".format(groupChipsets[groupName], self._inputFilename))
+                    raise SystemExit
+                groupChipsets[groupName] = self._inputFilename
+                if expand is True and description == "autotile":
+                    tile = autotileExpander.expandAutotile(tile)
+                groups.append((groupName, tile))
+            self._printVerbose("Extracted the tiles of the chipset \"{0}\".".format(self._inputFilename))
+        return groups
+
+    def launchAtlas(self, inputChipsets, outputPrefix, askConfirmation, verbose, expand=False, maxSize=2048, extrusion=0, padding=0, keyColors=[], keyTolerance=0):
+        """Writes the atlases <outputPrefix>_0.png, <outputPrefix>_1.png... and the manifest <outputPrefix>.json.
+        With <expand>, the atlases hold the expanded autotiles instead of the autotiles."""
+        from atlaspacker import AtlasPacker, makeManifest
+        self._extraKeyColors, self._keyTolerance = list(keyColors), keyTolerance
+        self._outputPrefix, self._askConfirmation, self._verbose = outputPrefix.replace("\\", "/"), askConfirmation, verbose
+        groups = self._collectGroups(inputChipsets, expand)
+        try:
+            with stage("pack"):
+                atlases = AtlasPacker(maxSize, extrusion, padding).pack(groups)
+        except ValueError as error:
+            print("The tiles could not be packed. Details:\n{0}".format(error))
+            raise SystemExit
+        outputFilenames = self.listOutputFilenames(self._outputPrefix, len(atlases))
+        for (atlas, rects), atlasFilename in zip(atlases, outputFilenames):
+            self._outputFilename = atlasFilename
+            self._saveImage(atlas, "atlas")
+        self._outputFilename = outputFilenames[-1]
+        self._checkArguments("Output already exists")
+        writeOutput(self._outputFilename, makeManifest([path.basename(atlasFilename) for atlasFilename in outputFilenames[:-1]], atlases, extrusion, padding), "w")
+        self._printVerbose("Successfully created the manifest \"{0}\": {1} groups of tiles in {2} atlases.".format(self._outputFilename, len(groups), len(atlases)))
+
+def parseColor(colorString):
+    colorString = colorString.lstrip("#")
+    if len(colorString) != 6:
+        raise ValueError("\"{0}\" is not a color in the rrggbb format.".format(colorString))
+    return tuple(int(colorString[i:i+2], 16) for i in (0, 2, 4))
+
+def runCommandLine(arguments=None):
+    """Runs the command given by <arguments>, the command line of the process by default."""
     parser = ArgumentParser()
     subparsers = parser.add_subparsers(title="Commands", description="The command to execute", dest="command")
     extractSubCommand = subparsers.add_parser("extract", help="Tile Extractor. Extracts the water tiles, animated tiles, autotiles, low tiles, and high tiles from an RPG Maker 200x chipset into individual images.")
     extractSubCommand.add_argument("-o", "--output", metavar="outputPrefix", dest="outputPrefix", default="extractedTiles", help="The prefix for each output file. By default, it is \"extractedTiles\", so the output files will be \"extractedTiles_at[0..11].png\", \"extractedTiles_w[0..2].png\", \"extractedTiles_an.png\", \"extractedTiles_lo.png\", and \"extractedTiles_hi.png\", located in the directory in which you launch the script. The script will ask you whether it should overwrite each file that already exists, unless you used the force option.")
-    extractSubCommand.add_argument("inputChipset", help="The chipset from which to extract. It must follow a few rules. It must be a PNG image, {0}x{1} wide. It must use RPG Maker 200x's chipset formatting.".format(ChipsetImageWidth, ChipsetImageHeight))
+    extractSubCommand.add_argument("inputChipsets", metavar="inputChipset", nargs="*", help="The chipset from which to extract. It must follow a few rules. It must be a PNG image, {0}x{1} wide. It must use RPG Maker 200x's chipset formatting. You can give several chipsets, directories of chipsets or glob patterns: each chipset is then extracted with the prefix followed by the chipset name, for instance \"extractedTiles_grass_at0.png\".".format(ChipsetImageWidth, ChipsetImageHeight))
+    extractSubCommand.add_argument("-m", "--manifest", metavar="manifestFile", dest="manifest", default=None, help="A text file listing chipsets to extract, one per line. Relative paths are relative to the manifest file. Lines starting with # are ignored.")
+    extractSubCommand.add_argument("-j", "--jobs", metavar="jobs", dest="jobs", type=int, default=1, help="The number of processes extracting chipsets at the same time when there are several chipsets. By default, it is 1. Use 0 to use every processor.")
     extractSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite every output file without warning you if it already exists.")
+    extractSubCommand.add_argument("--raw", action="store_const", const="raw", default="png", dest="imageFormat", help="Writes the images as raw uncompressed pixels (.raw) instead of PNG, so that they can be mapped in memory and used without decoding. The format is described in rawimage.py.")
+    extractSubCommand.add_argument("-i", "--indexed", action="store_true", help="Keeps the palette of the indexed input: the outputs are indexed images too, and the transparent colors become transparent palette indices. The images are smaller, and faster to write and to load.")
+    extractSubCommand.add_argument("-k", "--key", metavar="keyColor", dest="keyColors", action="append", type=parseColor, default=[], help="An additional color to make transparent in the high tiles, in the rrggbb format. The color of the top left pixel of the high tiles is always transparent. You can use this option several times.")
+    extractSubCommand.add_argument("-t", "--tolerance", metavar="tolerance", dest="keyTolerance", type=int, default=0, help="How far a color channel can be from a transparent color to be made transparent too. By default, it is 0: only the exact colors are transparent.")
+    extractSubCommand.add_argument("-c", "--cache", metavar="cacheDirectory", dest="cacheDirectory", default=None, help="A directory in which to remember what was made. The script does nothing if the input, the options and the outputs did not change since the last time, and only remakes the outputs which changed otherwise.")
     extractSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
     expandSubCommand = subparsers.add_parser("expand", help="Autotile Expander. Expands an autotile from RPG Maker 200x into a grid containing all the possible cases.")
     expandSubCommand.add_argument("-o", "--output", metavar="outputAutotile", dest="outputAutotile", default="expandedAutotile.png", help="The output file (the expanded autotile). By default, it is \"expandedAutotile.png\", located in the directory in which you launch the script. The script will ask you whether it should overwrite the file if it already exists, unless you used the force option.")
     expandSubCommand.add_argument("inputAutotile", help="The autotile to expand. It must follow a few rules. It must be a PNG image, {0}x{1} wide. It must use RPG Maker 200x's Autotile formatting.".format(AutotileImageWidth, AutotileImageHeight))
+    expandSubCommand.add_argument("--format", choices=["sheet", "minitiles"], dest="outputFormat", default="sheet", help="The format of the output. \"sheet\" makes the expanded autotile with its 48 tiles. \"minitiles\" makes a small atlas of the distinct {0}x{0} minitiles instead, along with the composition of the 48 tiles from these minitiles, in binary (.bin) and in JSON (.json) next to the atlas.".format(MiniTileSize))
+    expandSubCommand.add_argument("--raw", action="store_const", const="raw", default="png", dest="imageFormat", help="Writes the images as raw uncompressed pixels (.raw) instead of PNG, so that they can be mapped in memory and used without decoding. The format is described in rawimage.py.")
+    expandSubCommand.add_argument("-i", "--indexed", action="store_true", help="Keeps the palette of the indexed input: the outputs are indexed images too, and the transparent colors become transparent palette indices. The images are smaller, and faster to write and to load.")
     expandSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite the output file without warning you if it already exists. Furthermore, it won't ask add an extension to the output file if it lacks.")
+    expandSubCommand.add_argument("-c", "--cache", metavar="cacheDirectory", dest="cacheDirectory", default=None, help="A directory in which to remember what was made. The script does nothing if the input, the options and the outputs did not change since the last time, and only remakes the outputs which changed otherwise.")
     expandSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
     makeTilesetSubCommand = subparsers.add_parser("maketileset", help="Tileset Generator. Generates a tileset for Tiled map editor with an expanded autotile. You can use it directly (but manually) in your maps, or use it with the Rule Maker to make an automatic automapping rule.")
     makeTilesetSubCommand.add_argument("-o", "--output", metavar="outputTileset", dest="outputTileset", default="expandedAutotileTileset.tsx", help="The output file (the tileset). By default, it is \"expandedAutotileTileset.tsx\", located in the directory in which you launch the script. The script will ask you whether it should overwrite the file if it already exists, unless you used the force option.")
     makeTilesetSubCommand.add_argument("inputExpandedAutotile", help="The expanded autotile to make a tileset with. It must be a PNG image, {0}x{1} wide. To get this expanded autotile, use the autotile expander featured with Remex (with the command \"expand\").".format(AutoTilesetImageWidth, AutoTilesetImageHeight))
     makeTilesetSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite the output file without warning you if it already exists. Furthermore, it won't ask add an extension to the output file if it lacks.")
     makeTilesetSubCommand.add_argument("-r", "--relative", action="store_true", dest="relativePath", help="In the tileset file, use a relative path to the image itself. Warning: the same relative path will be used in the rulemap if you generate one with this tileset. To avoid any problem regarding paths, you should put your tilesets, maps and images in the same folder.")
+    makeTilesetSubCommand.add_argument("-w", "--wang", action="store_true", dest="wangSet", help="Adds a Wang set to the tileset, which describes the sides of its tiles. The tileset can then be drawn with the terrain brush of Tiled (version 1.5 or later), without automapping rules.")
+    makeTilesetSubCommand.add_argument("-c", "--cache", metavar="cacheDirectory", dest="cacheDirectory", default=None, help="A directory in which to remember what was made. The script does nothing if the input, the options and the outputs did not change since the last time, and only remakes the outputs which changed otherwise.")
     makeTilesetSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
     makeRuleSubCommand = subparsers.add_parser("makerule", help="Rule Maker. Generates an automapping rule for Tiled map editor using a tileset of an expanded autotile. It enables you to map autotiles automatically, without worrying about the precise case to use.")
-    makeRuleSubCommand.add_argument("inputTileset", help="The tileset for Tiled to make an automapping rule with. It must be a tsx file referring to an expanded autotile. To get the expanded autotile, use the autotile expander featured with Remex (with the command \"expand\"). To get the tileset, use the tileset maker featured with Remex (with the command \"maketileset\").")
+    makeRuleSubCommand.add_argument("inputTilesets", metavar="inputTileset", nargs="+", help="The tileset for Tiled to make an automapping rule with. It must be a tsx file referring to an expanded autotile. To get the expanded autotile, use the autotile expander featured with Remex (with the command \"expand\"). To get the tileset, use the tileset maker featured with Remex (with the command \"maketileset\"). You can give several tilesets: a rule is then made for each tileset.")
     makeRuleSubCommand.add_argument("-o", "--output", metavar="outputRule", dest="outputRule", default="automappingRule.tmx", help="The output file (the automapping rule). By default, it is \"automappingrule.tmx\", located in the directory in which you launch the script. The script will ask you whether it should overwrite the file if it already exists, unless you used the force option.")
-    makeRuleSubCommand.add_argument("-l", "--layer", metavar="mapLayer", dest="mapLayer", default="Tile Layer 1", help="The name of the map layer to consider during the automapping. By default, it is \"Tile Layer 1\". You can only choose a layer per rule, so you need to make another rule if you want another layer to be considered too.")
+    makeRuleSubCommand.add_argument("-l", "--layer", metavar="mapLayer", dest="mapLayers", action="append", default=None, help="The name of the map layer to consider during the automapping. By default, it is \"Tile Layer 1\". You can use this option several times: a rule is then made for each layer.")
+    makeRuleSubCommand.add_argument("-i", "--index", metavar="indexFile", dest="indexFilename", default=None, help="The rules.txt file listing the rules for Tiled. By default, it is only written when several rules are made, in the directory of the output rule.")
     makeRuleSubCommand.add_argument("-8", "--v08", dest="version08", action="store_true", help="Formats the rulemap for the 0.8 version of Tiled. By default, the rulemaker formats the rule for the 0.9 version.")
     makeRuleSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite the output file without warning you if it already exists. Furthermore, it won't ask add an extension to the output file if it lacks.")
+    makeRuleSubCommand.add_argument("-c", "--cache", metavar="cacheDirectory", dest="cacheDirectory", default=None, help="A directory in which to remember what was made. The script does nothing if the input, the options and the outputs did not change since the last time, and only remakes the outputs which changed otherwise.")
     makeRuleSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
-    answers = vars(parser.parse_args())
+    atlasSubCommand = subparsers.add_parser("atlas", help="Atlas Builder. Extracts the tiles of many RPG Maker 200x chipsets and packs them into a few texture atlases, along with a manifest giving the place of each group of tiles.")
+    atlasSubCommand.add_argument("inputChipsets", metavar="inputChipset", nargs="*", help="The chipset to extract tiles from. It must be a PNG image, {0}x{1} wide. You can give several chipsets, directories of chipsets or glob patterns.".format(ChipsetImageWidth, ChipsetImageHeight))
+    atlasSubCommand.add_argument("-o", "--output", metavar="outputPrefix", dest="outputPrefix", default="atlas", help="The prefix of the output files: the atlases \"atlas_0.png\", \"atlas_1.png\"... and the manifest \"atlas.json\" by default.")
+    atlasSubCommand.add_argument("-m", "--manifest", metavar="manifestFile", dest="manifest", default=None, help="A text file listing chipsets, one per line, relative to the text file.")
+    atlasSubCommand.add_argument("-e", "--expand", action="store_true", help="Puts the expanded autotiles in the atlases instead of the autotiles.")
+    atlasSubCommand.add_argument("-s", "--size", metavar="maxSize", dest="maxSize", type=int, default=2048, help="The largest width and height of an atlas. 2048 by default. The atlases are as small as possible, and their sides are powers of two.")
+    atlasSubCommand.add_argument("-x", "--extrude", metavar="pixels", dest="extrusion", type=int, default=0, help="Repeats the border pixels of each group of tiles this many times around it, so that texture filtering does not blend the neighbouring groups in.")
+    atlasSubCommand.add_argument("-p", "--padding", metavar="pixels", dest="padding", type=int, default=0, help="Transparent pixels around each group of tiles, after the extrusion.")
+    atlasSubCommand.add_argument("-k", "--key", metavar="keyColor", dest="keyColors", action="append", default=[], type=parseColor, help="An additional color to make transparent in the high tiles, in the rrggbb format. You can use this option several times.")
+    atlasSubCommand.add_argument("-t", "--tolerance", metavar="tolerance", dest="keyTolerance", type=int, default=0, help="How much each channel of a pixel can differ from a key color for the pixel to be made transparent. 0 by default.")
+    atlasSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite the output files without warning you if they already exist.")
+    atlasSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
+    buildSubCommand = subparsers.add_parser("build", help="Chipset Builder. Extracts the tiles from an RPG Maker 200x chipset, expands its autotiles, and makes a tileset and an automapping rule for each of them, without writing the intermediate files.")
+    buildSubCommand.add_argument("inputChipset", help="The chipset to build. It must follow a few rules. It must be a PNG image, {0}x{1} wide. It must use RPG Maker 200x's chipset formatting.".format(ChipsetImageWidth, ChipsetImageHeight))
+    buildSubCommand.add_argument("-o", "--output", metavar="outputPrefix", dest="outputPrefix", default="builtTiles", help="The prefix for each output file. By default, it is \"builtTiles\", so the output files will be \"builtTiles_at[0..11].png\" (the expanded autotiles), \"builtTiles_at[0..11].tsx\" (their tilesets), \"builtTiles_at[0..11].tmx\" (their automapping rules), \"builtTiles_w[0..2].png\", \"builtTiles_an.png\", \"builtTiles_lo.png\", and \"builtTiles_hi.png\". The script will ask you whether it should overwrite each file that already exists, unless you used the force option.")
+    buildSubCommand.add_argument("-l", "--layer", metavar="mapLayer", dest="mapLayer", default="Tile Layer 1", help="The name of the map layer to consider during the automapping. By default, it is \"Tile Layer 1\".")
+    buildSubCommand.add_argument("-8", "--v08", dest="version08", action="store_true", help="Formats the rulemaps for the 0.8 version of Tiled. By default, the rulemaker formats the rules for the 0.9 version.")
+    buildSubCommand.add_argument("-r", "--relative", action="store_true", dest="relativePath", help="In the tileset files, use a relative path to the images.")
+    buildSubCommand.add_argument("-w", "--wang", action="store_true", dest="wangSet", help="Adds a Wang set to the tilesets, so that they can be drawn with the terrain brush of Tiled.")
+    buildSubCommand.add_argument("-i", "--indexed", action="store_true", help="Keeps the palette of the indexed input: the outputs are indexed images too, and the transparent colors become transparent palette indices. The images are smaller, and faster to write and to load.")
+    buildSubCommand.add_argument("-k", "--key", metavar="keyColor", dest="keyColors", action="append", type=parseColor, default=[], help="An additional color to make transparent in the high tiles, in the rrggbb format. You can use this option several times.")
+    buildSubCommand.add_argument("-t", "--tolerance", metavar="tolerance", dest="keyTolerance", type=int, default=0, help="How far a color channel can be from a transparent color to be made transparent too. By default, it is 0.")
+    buildSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite every output file without warning you if it already exists.")
+    buildSubCommand.add_argument("-c", "--cache", metavar="cacheDirectory", dest="cacheDirectory", default=None, help="A directory in which to remember what was made. The script does nothing if the input, the options and the outputs did not change since the last time, and only remakes the outputs which changed otherwise.")
+    buildSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
+    autotileSubCommand = subparsers.add_parser("autotile", help="Map Autotiler. Autotiles the layers of maps for Tiled map editor directly, without the automapping of Tiled. It needs numpy.")
+    autotileSubCommand.add_argument("inputMaps", metavar="inputMap", nargs="+", help="The map to autotile. It must be a tmx file using one or several tilesets made from expanded autotiles. Its layers must be encoded in CSV or base64, uncompressed or compressed with zlib, gzip or zstd. You can give several maps, directories of maps or glob patterns.")
+    autotileSubCommand.add_argument("-o", "--output", metavar="outputMap", dest="outputMap", default=None, help="The output file (the autotiled map), when there is only one map. By default, the map is overwritten.")
+    autotileSubCommand.add_argument("-d", "--output-directory", metavar="outputDirectory", dest="outputDirectory", default=None, help="The directory in which to write the autotiled maps, with the same names. By default, the maps are overwritten.")
+    autotileSubCommand.add_argument("-t", "--tileset", metavar="tilesetName", dest="tilesetNames", action="append", default=None, help="The name of a tileset whose tiles must be autotiled. By default, every tileset of 48 tiles is considered. You can use this option several times.")
+    autotileSubCommand.add_argument("-l", "--layer", metavar="mapLayer", dest="mapLayers", action="append", default=None, help="The name of a layer to autotile. By default, every tile layer is autotiled. You can use this option several times.")
+    autotileSubCommand.add_argument("-e", "--edges", dest="outsideIsTerrain", action="store_true", help="Considers that the terrain goes on beyond the edges of the map, so that it does not get borders along the edges.")
+    autotileSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite the output files without warning you if they already exist.")
+    autotileSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
+    recolorSubCommand = subparsers.add_parser("recolor", help="Palette Recolorer. Makes color variants of indexed images, such as expanded autotiles, by changing their palette.")
+    recolorSubCommand.add_argument("inputImages", metavar="inputImage", nargs="+", help="The indexed image to recolor, for instance an autotile expanded with the indexed option. You can give several images, directories of images or glob patterns.")
+    recolorSubCommand.add_argument("-p", "--palettes", metavar="remapFile", dest="remapFile", required=True, help="A JSON file describing the variants, for instance {\"winter\": {\"30a040\": \"f0f0ff\"}, \"night\": {\"30a040\": \"102030\", \"i12\": \"000040\"}}. Each variant maps colors (rrggbb) or palette indices (i12) to new colors. The variant of \"grass.png\" named \"winter\" is written as \"grass_winter.png\".")
+    recolorSubCommand.add_argument("-d", "--output-directory", metavar="outputDirectory", dest="outputDirectory", default=None, help="The directory in which to write the variants. By default, each variant is written next to its image.")
+    recolorSubCommand.add_argument("-f", "--force", action="store_false", dest="askConfirmation", help="Forces the script to be executed without asking you anything. The script will overwrite the output files without warning you if they already exist.")
+    recolorSubCommand.add_argument("-c", "--cache", metavar="cacheDirectory", dest="cacheDirectory", default=None, help="A directory in which to remember what was made. The script does nothing for an image if the image, the variants and the outputs did not change since the last time.")
+    recolorSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints detailed information on the process.")
+    serveSubCommand = subparsers.add_parser("serve", help="Server. Keeps Remex running and answers extract, expand, maketileset and makerule jobs sent over HTTP, so that editor plugins and build tools do not start Remex for every file.")
+    serveSubCommand.add_argument("-H", "--host", dest="host", default="127.0.0.1", help="The address on which to listen. By default, it is \"127.0.0.1\", so that only this computer can send jobs.")
+    serveSubCommand.add_argument("-p", "--port", dest="port", type=int, default=8765, help="The port on which to listen. By default, it is 8765.")
+    serveSubCommand.add_argument("-u", "--socket", metavar="socketFile", dest="socketFilename", default=None, help="Listens on this Unix socket instead of a port.")
+    serveSubCommand.add_argument("-w", "--workers", metavar="workerCount", dest="workerCount", type=int, default=None, help="The number of jobs handled at the same time. The other jobs wait for their turn. By default, it depends on the number of processors.")
+    serveSubCommand.add_argument("-m", "--cache-size", metavar="cacheSize", dest="cacheSize", type=int, default=256, help="The number of recent results kept in memory, so that a job sent again is answered at once. By default, it is 256. 0 keeps nothing.")
+    serveSubCommand.add_argument("-v", "--verbose", action="store_true", help="Starts the program in verbose mode: it prints every request.")
+    serveSubCommand.set_defaults(askConfirmation=False)
+    for subCommand in subparsers.choices.values():
+        subCommand.add_argument("--profile", metavar="traceFile", dest="traceFilename", default=None, help="Measures the time, the CPU time, the bytes read and written and the peak memory of each stage of the command, prints them as a table, and writes them in <traceFile> as a Chrome trace, to open in chrome://tracing or in Perfetto.")
+    answers = vars(parser.parse_args(arguments))
     command, verbose, askConfirmation = answers["command"], answers["verbose"], answers["askConfirmation"]
-    if command == "extract":
-        tileExtractor, outputPrefix, inputChipset = TileExtractor("chipset", ".png"), answers["outputPrefix"], answers["inputChipset"]
-        tileExtractor.launchScript(inputChipset, outputPrefix, askConfirmation, verbose)
-    elif command == "expand":
-        autotileExpander, outputAutotile, inputAutotile = AutotileExpander("autotile", ".png"), answers["outputAutotile"], answers["inputAutotile"]
-        autotileExpander.launchScript(inputAutotile, outputAutotile, askConfirmation, verbose)
-    elif command == "maketileset":
-        tilesetGenerator, outputTileset, inputExpandedAutotile = TilesetGenerator("expanded autotile", ".tsx"), answers["outputTileset"], answers["inputExpandedAutotile"]
-        relativePath = answers["relativePath"]
-        tilesetGenerator.launchScript(inputExpandedAutotile, outputTileset, relativePath, askConfirmation, verbose)
-    elif command == "makerule":
-        ruleMaker, outputRule, inputTileset, mapLayer = RuleMaker("automapping rule", ".tmx"), answers["outputRule"], answers["inputTileset"], answers["mapLayer"]
-        version08 = answers["version08"]
-        ruleMaker.launchScript(inputTileset, outputRule, mapLayer, version08, askConfirmation, verbose)
+    cache = None
+    if answers.get("cacheDirectory") is not None:
+        cache = BuildCache(answers["cacheDirectory"])
+    if answers["traceFilename"] is not None:
+        profiler.startProfiling()
+    try:
+        with stage(command):
+            if command == "extract":
+                outputPrefix, inputChipsets, manifest = answers["outputPrefix"], answers["inputChipsets"], answers["manifest"]
+                if len(inputChipsets) == 1 and manifest is None and path.isdir(inputChipsets[0]) is False and glob.has_magic(inputChipsets[0]) is False:
+                    tileExtractor = TileExtractor("chipset", ImageFormatExtensions[answers["imageFormat"]])
+                    tileExtractor.setCache(cache)
+                    tileExtractor.launchScript(inputChipsets[0], outputPrefix, askConfirmation, verbose, keyColors=answers["keyColors"], keyTolerance=answers["keyTolerance"], imageFormat=answers["imageFormat"], indexed=answers["indexed"])
+                elif len(inputChipsets) == 0 and manifest is None:
+                    extractSubCommand.error("at least one chipset or a manifest is required")
+                else:
+                    batchTileExtractor = BatchTileExtractor()
+                    batchTileExtractor.launchBatch(inputChipsets, outputPrefix, askConfirmation, verbose, jobs=answers["jobs"], manifestFilename=manifest, keyColors=answers["keyColors"], keyTolerance=answers["keyTolerance"], imageFormat=answers["imageFormat"], indexed=answers["indexed"], cacheDirectory=answers["cacheDirectory"])
+            elif command == "expand":
+                autotileExpander, outputAutotile, inputAutotile = AutotileExpander("autotile", ImageFormatExtensions[answers["imageFormat"]]), answers["outputAutotile"], answers["inputAutotile"]
+                if answers["imageFormat"] == "raw" and outputAutotile == "expandedAutotile.png":
+                    outputAutotile = "expandedAutotile.raw"
+                autotileExpander.setCache(cache)
+                autotileExpander.launchScript(inputAutotile, outputAutotile, askConfirmation, verbose, outputFormat=answers["outputFormat"], imageFormat=answers["imageFormat"], indexed=answers["indexed"])
+            elif command == "maketileset":
+                tilesetGenerator, outputTileset, inputExpandedAutotile = TilesetGenerator("expanded autotile", ".tsx"), answers["outputTileset"], answers["inputExpandedAutotile"]
+                relativePath = answers["relativePath"]
+                tilesetGenerator.setCache(cache)
+                tilesetGenerator.launchScript(inputExpandedAutotile, outputTileset, relativePath, askConfirmation, verbose, wangSet=answers["wangSet"])
+            elif command == "makerule":
+                outputRule, inputTilesets, mapLayers = answers["outputRule"], answers["inputTilesets"], answers["mapLayers"] or ["Tile Layer 1"]
+                version08 = answers["version08"]
+                if len(inputTilesets) == 1 and len(mapLayers) == 1 and answers["indexFilename"] is None:
+                    ruleMaker = RuleMaker("automapping rule", ".tmx")
+                    ruleMaker.setCache(cache)
+                    ruleMaker.launchScript(inputTilesets[0], outputRule, mapLayers[0], version08, askConfirmation, verbose)
+                else:
+                    ruleSetMaker = RuleSetMaker()
+                    ruleSetMaker.setCache(cache)
+                    ruleSetMaker.launchScript(inputTilesets, outputRule, mapLayers, version08, askConfirmation, verbose, indexFilename=answers["indexFilename"])
+            elif command == "autotile":
+                inputMaps = collectFiles(answers["inputMaps"], ".tmx")
+                if answers["outputDirectory"] is not None:
+                    os.makedirs(answers["outputDirectory"], exist_ok=True)
+                if answers["outputMap"] is not None and len(inputMaps) > 1:
+                    autotileSubCommand.error("the output option only works with one map, use the output directory option instead")
+                for inputMap in inputMaps:
+                    outputMap = answers["outputMap"] or inputMap
+                    if answers["outputDirectory"] is not None:
+                        outputMap = path.join(answers["outputDirectory"], path.basename(inputMap))
+                    mapAutotiler = MapAutotiler("map", ".tmx")
+                    testSteps = ["Input exists", "Input validity", "Output without extension", "Output already exists"]
+                    if outputMap == inputMap:
+                        testSteps = ["Input exists", "Input validity"] #Autotiling a map in place is what the user asked for
+                    mapAutotiler.launchScript(inputMap, outputMap, answers["tilesetNames"], answers["mapLayers"], answers["outsideIsTerrain"], askConfirmation, verbose, testSteps=testSteps)
+            elif command == "atlas":
+                atlasBuilder = AtlasBuilder("chipset", ".png")
+                inputChipsets = collectFiles(answers["inputChipsets"], ".png", answers["manifest"])
+                if len(inputChipsets) == 0:
+                    atlasSubCommand.error("no input chipset was given")
+                atlasBuilder.launchAtlas(inputChipsets, answers["outputPrefix"], askConfirmation, verbose, expand=answers["expand"], maxSize=answers["maxSize"], extrusion=answers["extrusion"], padding=answers["padding"], keyColors=answers["keyColors"], keyTolerance=answers["keyTolerance"])
+            elif command == "recolor":
+                paletteRecolorer = PaletteRecolorer("indexed image", ".png")
+                paletteRecolorer.setCache(cache)
+                paletteRecolorer.launchBatch(answers["inputImages"], answers["remapFile"], answers["outputDirectory"], askConfirmation, verbose)
+            elif command == "serve":
+                from server import serve
+                serve(answers["host"], answers["port"], answers["socketFilename"], answers["workerCount"], answers["cacheSize"], verbose)
+            elif command == "build":
+                chipsetBuilder = ChipsetBuilder("chipset", ".png")
+                chipsetBuilder.setCache(cache)
+                chipsetBuilder.launchScript(answers["inputChipset"], answers["outputPrefix"], answers["mapLayer"], answers["version08"], answers["relativePath"], askConfirmation, verbose, keyColors=answers["keyColors"], keyTolerance=answers["keyTolerance"], wangSet=answers["wangSet"], indexed=answers["indexed"])
+    finally:
+        profiler.stopProfiling(answers["traceFilename"])
+
+if __name__ == "__main__":
+    runCommandLine()
@@ -0,0 +1,112 @@
+"""Measures the stages of the scripts while they run: wall time, CPU time, bytes read and written, and peak memory.
+The stages are written as a Chrome trace, which can be opened in chrome://tracing or in Perfetto, and summed up in a table.
+Profiling is off until startProfiling is called: the stages then cost nearly nothing."""
+import json, os, threading, time
+from contextlib import contextmanager
+
+class StageRecord:
+    """What a stage measured. The code running the stage adds the bytes it reads and writes to it."""
+    def __init__(self, name):
+        self.name, self.bytesRead, self.bytesWritten, self.peakMemory = name, 0, 0, 0
+
+class Profiler:
+    """Keeps the stages of every thread. With <traceMemory>, the peak memory of each stage is measured with tracemalloc.
+    tracemalloc only sees the memory allocated by Python, not the pixel buffers of Pillow, and it slows the scripts down."""
+    def __init__(self, traceMemory=True):
+        self._events, self._lock, self._threadStacks = [], threading.Lock(), threading.local()
+        self._traceMemory, self._startTime, self._processId = traceMemory, time.perf_counter(), os.getpid()
+        if traceMemory is True:
+            import tracemalloc
+            self._tracemalloc = tracemalloc
+            if tracemalloc.is_tracing() is False:
+                tracemalloc.start()
+
+    def _getStack(self):
+        if hasattr(self._threadStacks, "stack") is False:
+            self._threadStacks.stack = []
+        return self._threadStacks.stack
+
+    @contextmanager
+    def stage(self, name):
+        stack, record = self._getStack(), StageRecord(name)
+        if self._traceMemory is True:
+            #The peak is reset for each stage, so the peak reached so far is given to the enclosing stage first
+            if len(stack) > 0:
+                stack[-1].peakMemory = max(stack[-1].peakMemory, self._tracemalloc.get_traced_memory()[1])
+            self._tracemalloc.reset_peak()
+        stack.append(record)
+        startTime, startCPUTime = time.perf_counter(), time.thread_time()
+        try:
+            yield record
+        finally:
+            endTime, endCPUTime = time.perf_counter(), time.thread_time()
+            stack.pop()
+            if self._traceMemory is True:
+                record.peakMemory = max(record.peakMemory, self._tracemalloc.get_traced_memory()[1])
+                if len(stack) > 0:
+                    stack[-1].peakMemory = max(stack[-1].peakMemory, record.peakMemory)
+            event = dict(name=name, cat="remex", ph="X", pid=self._processId, tid=threading.get_ident(),
+                    ts=round((startTime - self._startTime) * 1e6, 3), dur=round((endTime - startTime) * 1e6, 3),
+                    args=dict(cpuMs=round((endCPUTime - startCPUTime) * 1e3, 3), bytesRead=record.bytesRead, bytesWritten=record.bytesWritten, peakMemory=record.peakMemory, depth=len(stack)))
+            with self._lock:
+                self._events.append(event)
+
+    def listEvents(self):
+        with self._lock:
+            return list(self._events)
+
+    def makeTrace(self):
+        """Returns the Chrome trace of the stages, in the JSON object format."""
+        threadNames = [dict(name="thread_name", ph="M", pid=self._processId, tid=thread.ident, args=dict(name=thread.name)) for thread in threading.enumerate()]
+        return json.dumps(dict(traceEvents=threadNames + self.listEvents(), displayTimeUnit="ms"))
+
+    def makeSummary(self):
+        """Returns a table giving, for each stage, its count, its total wall and CPU times, the bytes it read and wrote, and its largest peak memory.
+        The times of a stage include the ones of the stages it contains."""
+        stages = dict()
+        for event in self.listEvents():
+            count, wallTime, cpuTime, bytesRead, bytesWritten, peakMemory = stages.get(event["name"], (0, 0, 0, 0, 0, 0))
+            arguments = event["args"]
+            stages[event["name"]] = (count+1, wallTime + event["dur"]/1e3, cpuTime + arguments["cpuMs"], bytesRead + arguments["bytesRead"], bytesWritten + arguments["bytesWritten"], max(peakMemory, arguments["peakMemory"]))
+        lines = ["{0:<20} {1:>6} {2:>11} {3:>11} {4:>13} {5:>13} {6:>13}".format("stage", "count", "wall ms", "cpu ms", "read bytes", "written bytes", "peak memory")]
+        for name, (count, wallTime, cpuTime, bytesRead, bytesWritten, peakMemory) in sorted(stages.items(), key=lambda item: -item[1][1]):
+            lines.append("{0:<20} {1:>6} {2:>11.2f} {3:>11.2f} {4:>13} {5:>13} {6:>13}".format(name, count, wallTime, cpuTime, bytesRead, bytesWritten, peakMemory if self._traceMemory is True else "-"))
+        return "\n".join(lines)
+
+    def stop(self):
+        if self._traceMemory is True and self._tracemalloc.is_tracing() is True:
+            self._tracemalloc.stop()
+
+_activeProfiler = None
+
+@contextmanager
+def _noStage():
+    yield StageRecord("")
+
+def stage(name):
+    """Returns a context manager measuring the stage <name> when profiling is on. It gives a StageRecord to count the bytes read and written."""
+    if _activeProfiler is None:
+        return _noStage()
+    return _activeProfiler.stage(name)
+
+def isProfiling():
+    return _activeProfiler is not None
+
+def startProfiling(traceMemory=True):
+    global _activeProfiler
+    _activeProfiler = Profiler(traceMemory)
+    return _activeProfiler
+
+def stopProfiling(traceFilename=None):
+    """Stops profiling, writes the Chrome trace in <traceFilename> when it is given, and prints the summary."""
+    global _activeProfiler
+    profiler, _activeProfiler = _activeProfiler, None
+    if profiler is None:
+        return
+    profiler.stop()
+    if traceFilename is not None:
+        with open(traceFilename, "w") as traceFile:
+            traceFile.write(profiler.makeTrace())
+    print(profiler.makeSummary())
+    if traceFilename is not None:
+        print("The trace of the stages was written in \"{0}\". Open it in chrome://tracing or in Perfetto.".format(traceFilename))
@@ -0,0 +1,105 @@
+import mmap, struct
+from PIL import Image as ImagePIL
+
+#Layout of a raw image file:
+#- a header of RawImageHeaderSize bytes (RawImageHeader, then zeros). The last field is the transparent palette index of "P" images, or -1,
+#- for "P" images, the palette: 256 RGB entries,
+#- the pixel rows, starting at a multiple of RawImageDataAlignment. Each row is rowStride bytes long, a multiple of the row alignment, and is padded with zeros.
+#Every number is little-endian.
+RawImageMagic, RawImageVersion = b"RMXR", 1
+RawImageHeader = struct.Struct("<4sHHIIHHIIII8sh")
+RawImageHeaderSize, RawImageDataAlignment = 64, 64
+RawImageModes = {"L": 1, "P": 1, "LA": 2, "RGB": 3, "RGBA": 4}
+
+def _alignUp(value, alignment):
+    return (value + alignment - 1) // alignment * alignment
+
+def _hasSingleTransparentIndex(transparency):
+    """Tells whether the transparency table of a "P" image only makes one index fully transparent, and leaves the others opaque."""
+    return transparency.count(b"\0") == 1 and transparency.count(b"\xff") == len(transparency) - 1
+
+def makeRawImage(image, rowAlignment=4):
+    """Returns the bytes of the raw image file of <image>. Its rows are aligned on <rowAlignment> bytes.
+    A "P" image whose transparency cannot be given by a single index is written as an "RGBA" image."""
+    if image.mode == "P" and isinstance(image.info.get("transparency"), bytes) and _hasSingleTransparentIndex(image.info["transparency"]) is False:
+        image = image.convert("RGBA")
+    if image.mode not in RawImageModes:
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    width, height = image.size
+    bytesPerPixel = RawImageModes[image.mode]
+    rowStride = _alignUp(width*bytesPerPixel, rowAlignment)
+    palette = b""
+    if image.mode == "P":
+        palette = bytes(image.getpalette("RGB") or []).ljust(256*3, b"\0")
+    transparency = image.info.get("transparency", -1) if image.mode == "P" else -1
+    if isinstance(transparency, bytes): #A table with a single transparent index
+        transparency = transparency.find(b"\0")
+    dataOffset = _alignUp(RawImageHeaderSize + len(palette), RawImageDataAlignment)
+    header = RawImageHeader.pack(RawImageMagic, RawImageVersion, RawImageHeaderSize, width, height, bytesPerPixel, rowAlignment, rowStride, dataOffset,
+            RawImageHeaderSize if len(palette) > 0 else 0, len(palette), image.mode.encode(), transparency)
+    pixelData = image.tobytes()
+    if rowStride != width*bytesPerPixel: #Each row is padded up to the stride
+        rowPadding, rowLength = b"\0" * (rowStride - width*bytesPerPixel), width*bytesPerPixel
+        pixelData = b"".join([pixelData[i:i+rowLength] + rowPadding for i in range(0, len(pixelData), rowLength)])
+    return header.ljust(RawImageHeaderSize, b"\0") + palette + b"\0" * (dataOffset - RawImageHeaderSize - len(palette)) + pixelData
+
+def saveRawImage(image, outputFilename, rowAlignment=4):
+    with open(outputFilename, "wb") as outputFile:
+        outputFile.write(makeRawImage(image, rowAlignment))
+
+class RawImage:
+    """A raw image file mapped in memory. Nothing is decoded nor copied: the pixels are read from the mapped file itself.
+    It can be used as a context manager, which closes the mapping once the arrays and images made from it are dropped."""
+    def __init__(self, inputFilename):
+        with open(inputFilename, "rb") as inputFile:
+            self._map = mmap.mmap(inputFile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, headerSize, self.width, self.height, self.bytesPerPixel, self.rowAlignment, self.rowStride, self.dataOffset, paletteOffset, paletteLength, mode, self.transparency = RawImageHeader.unpack_from(self._map)
+        except struct.error:
+            self.close()
+            raise ValueError("The file \"{0}\" is too short to be a raw image.".format(inputFilename))
+        self.mode = mode.rstrip(b"\0").decode()
+        if magic != RawImageMagic or version != RawImageVersion or RawImageModes.get(self.mode) != self.bytesPerPixel or len(self._map) < self.dataOffset + self.rowStride*self.height:
+            self.close()
+            raise ValueError("The file \"{0}\" is not a valid raw image.".format(inputFilename))
+        self.size = self.width, self.height
+        self.palette = bytes(self._map[paletteOffset:paletteOffset+paletteLength]) if paletteLength > 0 else None
+        self.pixels = memoryview(self._map)[self.dataOffset:self.dataOffset+self.rowStride*self.height]
+
+    def getRow(self, y):
+        """Returns the pixels of the row <y>, without the padding."""
+        return self.pixels[y*self.rowStride:y*self.rowStride+self.width*self.bytesPerPixel]
+
+    def toImage(self):
+        """Returns a PIL image of the pixels. "L", "P" and "RGBA" images share the memory of the mapping, without any copy. Pillow copies the pixels of the other modes."""
+        image = ImagePIL.frombuffer(self.mode, self.size, self.pixels, "raw", self.mode, self.rowStride, 1)
+        if self.palette is not None:
+            image.putpalette(self.palette)
+        if self.transparency >= 0:
+            image.info["transparency"] = self.transparency
+        return image
+
+    def toArray(self):
+        """Returns a numpy array of shape (height, width) or (height, width, channels) viewing the pixels, without any copy."""
+        import numpy
+        pixels = numpy.frombuffer(self.pixels, dtype=numpy.uint8).reshape(self.height, self.rowStride)[:, :self.width*self.bytesPerPixel]
+        if self.bytesPerPixel == 1:
+            return pixels
+        return pixels.reshape(self.height, self.width, self.bytesPerPixel)
+
+    def close(self):
+        """Closes the mapping. While arrays or images made from it are still used, the mapping stays open, and is closed when they are all dropped."""
+        if self._map is not None:
+            try:
+                if hasattr(self, "pixels"):
+                    self.pixels.release()
+                self._map.close()
+            except BufferError: #The mapping is then closed by the garbage collector
+                pass
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -0,0 +1,4 @@
+#!/usr/bin/python3
+#Starts the command line of Remex faster than main.py: Python caches the compiled module main, while it compiles a script again at every start
+from main import runCommandLine
+runCommandLine()
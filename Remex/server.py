@@ -0,0 +1,227 @@
+import base64, hashlib, json, os, socket, socketserver, stat, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs
+import api
+
+#Content type of the outputs of each image format
+ImageContentTypes = {"png": "image/png", "raw": "application/octet-stream"}
+MaxRequestSize = 64*1024*1024
+#Seconds a client may stay silent before its connection is closed, so that idle or slow clients cannot hold the workers
+RequestTimeout = 30
+
+class ResultCache:
+    """Keeps the responses of the last <maxEntries> jobs in memory, so that a job sent again is answered without being run again."""
+    def __init__(self, maxEntries=256):
+        self._maxEntries, self._entries, self._lock = maxEntries, OrderedDict(), threading.Lock()
+        self.hits, self.misses = 0, 0
+
+    def makeKey(self, job, options, data):
+        digest = hashlib.sha256(json.dumps([job, options], sort_keys=True).encode())
+        digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        if self._maxEntries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxEntries:
+                self._entries.popitem(last=False)
+
+    def describe(self):
+        with self._lock:
+            return dict(entries=len(self._entries), maxEntries=self._maxEntries, hits=self.hits, misses=self.misses)
+
+def _getOption(options, name, default=None):
+    return options[name][-1] if name in options else default
+
+def _getFlag(options, name):
+    return _getOption(options, name, "0").lower() in ("1", "true", "yes", "on")
+
+def _getImageFormat(options):
+    imageFormat = _getOption(options, "format", "png")
+    if imageFormat not in ImageContentTypes:
+        raise api.UnsupportedFormatError("The image format \"{0}\" is not supported. The formats are {1}.".format(imageFormat, ", ".join(ImageContentTypes)))
+    return imageFormat
+
+def _runExtract(data, options):
+    from main import parseColor
+    imageFormat = _getImageFormat(options)
+    try:
+        keyColors, keyTolerance = [parseColor(keyColor) for keyColor in options.get("keyColor", [])], int(_getOption(options, "keyTolerance", "0"))
+    except ValueError as error:
+        raise api.RemexError("The key colors or the key tolerance are wrong. Details:\n{0}".format(error))
+    tiles = api.extractChipset(data, keyColors, keyTolerance, _getFlag(options, "indexed"), imageFormat)
+    #The groups of tiles are sent together in a JSON object, by suffix
+    description = dict(format=imageFormat, tiles=dict([(suffix, base64.b64encode(tile).decode()) for suffix, tile in tiles.items()]))
+    return "application/json", json.dumps(description).encode()
+
+def _runExpand(data, options):
+    imageFormat = _getImageFormat(options)
+    return ImageContentTypes[imageFormat], api.expandAutotile(data, _getFlag(options, "indexed"), imageFormat)
+
+def _runMakeTileset(data, options):
+    return "application/xml", api.makeTileset(_getOption(options, "image", "expandedAutotile.png"), _getOption(options, "name", "Tileset"), _getFlag(options, "wang"))
+
+def _runMakeRule(data, options):
+    return "application/xml", api.makeRule(data, _getOption(options, "layer", "Tile Layer 1"), _getFlag(options, "v08"))
+
+#The jobs a client can send, by path. Each one takes the body of the request and its query options, and returns the content type and the body of the response
+Jobs = {"/extract": _runExtract, "/expand": _runExpand, "/maketileset": _runMakeTileset, "/makerule": _runMakeRule}
+
+class RemexRequestHandler(BaseHTTPRequestHandler):
+    """Answers a job sent with POST /<job>?<options>, whose body is the input file. GET /status describes the server."""
+    server_version = "Remex"
+    timeout = RequestTimeout
+
+    def _sendResponse(self, status, contentType, body):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sendError(self, status, message):
+        self._sendResponse(status, "text/plain; charset=utf-8", message.encode())
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/status":
+            self._sendError(404, "Only /status can be read. The jobs are sent with POST: {0}.".format(", ".join(Jobs)))
+            return
+        self._sendResponse(200, "application/json", json.dumps(dict(jobs=list(Jobs), workers=self.server.workerCount, cache=self.server.resultCache.describe())).encode())
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in Jobs:
+            self._sendError(404, "The job \"{0}\" does not exist. The jobs are {1}.".format(url.path, ", ".join(Jobs)))
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            length = -1
+        if length < 0 or length > MaxRequestSize:
+            self._sendError(413, "The input must be at most {0} bytes long.".format(MaxRequestSize))
+            return
+        try:
+            data, options = self.rfile.read(length), parse_qs(url.query)
+        except TimeoutError:
+            self.close_connection = True
+            return
+        if len(data) != length:
+            self._sendError(400, "The input is shorter than its Content-Length.")
+            self.close_connection = True
+            return
+        resultKey = self.server.resultCache.makeKey(url.path, options, data)
+        response = self.server.resultCache.get(resultKey)
+        if response is None:
+            try:
+                response = Jobs[url.path](data, options)
+            except api.RemexError as error:
+                self._sendError(400, str(error))
+                return
+            except Exception as error: #The client gets an answer, and the error is printed by the server
+                self._sendError(500, "The job failed. Details:\n{0}".format(error))
+                raise
+            self.server.resultCache.put(resultKey, response)
+        self._sendResponse(200, *response)
+
+    def log_message(self, format, *arguments):
+        if self.server.verbose is True:
+            print("{0} - {1}".format(self.address_string(), format % arguments))
+
+class _PooledServerMixIn:
+    """Handles each connection in a pool of <workerCount> threads, instead of a new thread per connection, so that a burst of clients cannot overload the machine.
+    No more connections are accepted while every worker is busy: the others wait in the listen queue of the system."""
+    _pool = None
+
+    def _startPool(self, workerCount, resultCache, verbose):
+        self.workerCount, self.resultCache, self.verbose = workerCount, resultCache, verbose
+        self._pool, self._freeWorkers = ThreadPoolExecutor(max_workers=workerCount, thread_name_prefix="remex"), threading.BoundedSemaphore(workerCount)
+
+    def process_request(self, request, clientAddress):
+        self._freeWorkers.acquire() #Released by the worker once the connection is closed
+        try:
+            self._pool.submit(self._processRequest, request, clientAddress)
+        except RuntimeError: #The pool was shut down
+            self._freeWorkers.release()
+            raise
+
+    def _processRequest(self, request, clientAddress):
+        try:
+            self.finish_request(request, clientAddress)
+        except Exception:
+            self.handle_error(request, clientAddress)
+        finally:
+            self.shutdown_request(request)
+            self._freeWorkers.release()
+
+    def server_close(self):
+        super().server_close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+class PooledHTTPServer(_PooledServerMixIn, HTTPServer):
+    pass
+
+if hasattr(socket, "AF_UNIX"):
+    class PooledUnixHTTPServer(_PooledServerMixIn, socketserver.UnixStreamServer):
+        def get_request(self):
+            request, clientAddress = super().get_request()
+            return request, ("local", 0) #The clients of a Unix socket have no address
+
+def warmUp():
+    """Compiles the plans of the expander and the tables of the resolver once, before the first job."""
+    from main import getMinitileSources, getGatherPlan
+    getMinitileSources()
+    for bytesPerPixel in (1, 3):
+        getGatherPlan(bytesPerPixel)
+    try:
+        from autotileresolver import AutotileResolver
+        AutotileResolver().getNeighbourTable()
+    except ImportError: #The resolver needs numpy, which the jobs of the server do not need
+        pass
+
+def makeServer(host="127.0.0.1", port=8765, socketFilename=None, workerCount=None, cacheSize=256, verbose=False):
+    """Returns the server, listening on <socketFilename> when it is given, on <host>:<port> otherwise."""
+    workerCount = workerCount or min(32, (os.cpu_count() or 1) + 4)
+    if socketFilename is not None:
+        if hasattr(socket, "AF_UNIX") is False:
+            raise OSError("Unix sockets are not supported on this system.")
+        if os.path.exists(socketFilename) and stat.S_ISSOCK(os.stat(socketFilename).st_mode):
+            os.remove(socketFilename) #A socket left by a server which was stopped
+        server = PooledUnixHTTPServer(socketFilename, RemexRequestHandler, bind_and_activate=True)
+    else:
+        server = PooledHTTPServer((host, port), RemexRequestHandler)
+    server._startPool(workerCount, ResultCache(cacheSize), verbose)
+    return server
+
+def serve(host="127.0.0.1", port=8765, socketFilename=None, workerCount=None, cacheSize=256, verbose=False):
+    """Keeps answering jobs until the process is interrupted."""
+    warmUp()
+    try:
+        server = makeServer(host, port, socketFilename, workerCount, cacheSize, verbose)
+    except OSError as error:
+        print("The server could not be started. Details:\n{0}".format(error))
+        raise SystemExit(1)
+    print("Remex is serving on {0} with {1} workers. Press Ctrl+C to stop.".format(socketFilename if socketFilename is not None else "http://{0}:{1}".format(*server.server_address[:2]), server.workerCount))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socketFilename is not None and os.path.exists(socketFilename):
+            os.remove(socketFilename)
@@ -0,0 +1,119 @@
+import array, binascii, sys, zlib
+from profiler import stage
+
+#Tiled stores every cell of a layer as a little-endian unsigned 32-bit gid
+CellTypecode = "I" if array.array("I").itemsize == 4 else "L"
+CellSize = 4
+
+def _openZstandard():
+    """Returns the decompress and compress functions of zstd, and the error raised on invalid data."""
+    try:
+        from compression import zstd #Python 3.14 and later
+        return zstd.decompress, zstd.compress, zstd.ZstdError
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("The zstd compression needs Python 3.14 or the zstandard module.")
+    return (lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)), (lambda data: zstandard.ZstdCompressor().compress(data)), zstandard.ZstdError
+
+def _decompress(data, compression):
+    try:
+        if compression == "zlib":
+            return zlib.decompress(data)
+        elif compression == "gzip":
+            return zlib.decompress(data, 16+zlib.MAX_WBITS)
+    except zlib.error as error:
+        raise ValueError("Invalid {0} layer data: {1}".format(compression, error))
+    if compression == "zstd":
+        decompress, compress, zstdError = _openZstandard()
+        try:
+            return decompress(data)
+        except zstdError as error:
+            raise ValueError("Invalid zstd layer data: {0}".format(error))
+    raise ValueError("The compression \"{0}\" is not supported.".format(compression))
+
+def decompressCells(data, compression=None):
+    """Returns the raw bytes of the cells from their compressed bytes."""
+    if compression is None or compression == "":
+        return data
+    with stage("decompress " + compression) as record:
+        record.bytesRead = len(data)
+        return _decompress(data, compression)
+
+def _compress(data, compression):
+    if compression == "zlib":
+        return zlib.compress(data)
+    elif compression == "gzip":
+        compressor = zlib.compressobj(wbits=16+zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    elif compression == "zstd":
+        return _openZstandard()[1](data)
+    raise ValueError("The compression \"{0}\" is not supported.".format(compression))
+
+def compressCells(data, compression=None):
+    """Returns the compressed bytes of the raw bytes of the cells."""
+    if compression is None or compression == "":
+        return bytes(data)
+    with stage("compress " + compression) as record:
+        compressedData = _compress(data, compression)
+        record.bytesWritten = len(compressedData)
+        return compressedData
+
+def packCells(cells):
+    """Returns the cells as little-endian bytes, ready to be compressed. <cells> is any buffer of 32-bit unsigned cells, like an array or a numpy array.
+    On little-endian machines, the buffer is used as it is, without any copy."""
+    cellBytes = memoryview(cells).cast("B")
+    if sys.byteorder == "little":
+        return cellBytes
+    swappedCells = array.array(CellTypecode)
+    swappedCells.frombytes(cellBytes)
+    swappedCells.byteswap()
+    return swappedCells
+
+def unpackCells(data, cellCount=None):
+    """Returns the array of cells held by the little-endian bytes <data>, and checks that there are <cellCount> cells when it is given."""
+    if len(data) % CellSize != 0 or (cellCount is not None and len(data) != cellCount * CellSize):
+        raise ValueError("The layer data holds {0} bytes instead of {1}.".format(len(data), (cellCount if cellCount is not None else len(data) // CellSize) * CellSize))
+    cells = array.array(CellTypecode)
+    cells.frombytes(data)
+    if sys.byteorder == "big":
+        cells.byteswap()
+    return cells
+
+def decodeCells(text, encoding, compression=None, cellCount=None):
+    """Returns the array of the gids of a layer or chunk from the text of its data, encoded in "base64" or "csv"."""
+    if encoding == "base64":
+        try:
+            data = binascii.a2b_base64(text)
+        except binascii.Error as error:
+            raise ValueError("The layer data is not valid base64: {0}".format(error))
+        return unpackCells(decompressCells(data, compression), cellCount)
+    elif encoding == "csv":
+        try:
+            cells = array.array(CellTypecode, map(int, text.replace("\n", "").replace("\r", "").split(",")))
+        except (ValueError, OverflowError) as error:
+            raise ValueError("The layer data is not valid CSV: {0}".format(error))
+        if cellCount is not None and len(cells) != cellCount:
+            raise ValueError("The layer data holds {0} cells instead of {1}.".format(len(cells), cellCount))
+        return cells
+    raise ValueError("The layer data must be encoded in base64 or CSV.")
+
+def encodeCells(cells, encoding, compression=None, width=None):
+    """Returns the text of the data of a layer or chunk from its cells. In CSV, the rows are <width> cells long."""
+    if encoding == "base64":
+        return binascii.b2a_base64(compressCells(packCells(cells), compression), newline=False).decode()
+    elif encoding == "csv":
+        cells = memoryview(cells).cast("B").cast(CellTypecode)
+        width = width or len(cells)
+        return "\n" + ",\n".join([",".join(map(str, cells[i:i+width].tolist())) for i in range(0, len(cells), width)]) + "\n"
+    raise ValueError("The layer data must be encoded in base64 or CSV.")
+
+def readData(dataXML, text=None, cellCount=None):
+    """Decodes the cells of a data element of a tmx file, or of one of its chunks when <text> is the text of the chunk."""
+    return decodeCells((dataXML.text or "") if text is None else text, dataXML.get("encoding"), dataXML.get("compression"), cellCount)
+
+def writeData(dataXML, cells, width=None):
+    """Encodes <cells> with the same encoding and compression as the data element, and returns the text."""
+    return encodeCells(cells, dataXML.get("encoding"), dataXML.get("compression"), width)
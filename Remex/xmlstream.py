@@ -0,0 +1,72 @@
+import io
+
+def _escape(data):
+    return data.replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+class XMLStreamWriter:
+    """Writes an XML document to a file element by element, without building it in memory first.
+    The layout is the same as the one of minidom's writexml with <addindent> and <newl>."""
+    def __init__(self, outputFile, addindent="", newl="", encoding=None):
+        self._outputFile, self._addindent, self._newl, self._encoding = outputFile, addindent, newl, encoding
+        self._openElements = []
+
+    def _writeStartTag(self, name, attributes):
+        self._outputFile.write("{0}<{1}".format(self._addindent*len(self._openElements), name))
+        for attributeName, attributeValue in attributes:
+            self._outputFile.write(" {0}=\"{1}\"".format(attributeName, _escape(str(attributeValue))))
+
+    def startDocument(self):
+        if self._encoding is None:
+            self._outputFile.write("<?xml version=\"1.0\" ?>" + self._newl)
+        else:
+            self._outputFile.write("<?xml version=\"1.0\" encoding=\"{0}\"?>{1}".format(self._encoding, self._newl))
+
+    def startElement(self, name, attributes=[]):
+        """Opens an element with child elements. <attributes> is a list of (name, value) pairs."""
+        self._writeStartTag(name, attributes)
+        self._outputFile.write(">" + self._newl)
+        self._openElements.append(name)
+
+    def endElement(self):
+        name = self._openElements.pop()
+        self._outputFile.write("{0}</{1}>{2}".format(self._addindent*len(self._openElements), name, self._newl))
+
+    def element(self, name, attributes=[], text=None):
+        """Writes a whole element, either empty or only containing <text>."""
+        self._writeStartTag(name, attributes)
+        if text is None or text == "":
+            self._outputFile.write("/>" + self._newl)
+        else:
+            self._outputFile.write(">{0}</{1}>{2}".format(_escape(text), name, self._newl))
+
+    def writeElement(self, element):
+        """Writes an ElementTree element and its children. The whitespace between the elements is not kept, the writer indents them itself."""
+        children, text = list(element), (element.text or "").strip()
+        if len(children) == 0:
+            self.element(element.tag, element.attrib.items(), text)
+        else:
+            self.startElement(element.tag, element.attrib.items())
+            for child in children:
+                self.writeElement(child)
+            self.endElement()
+
+class StreamedDocument:
+    """An XML document which is only generated when it is written, by calling <writeContent> with an XMLStreamWriter.
+    It can be written like a minidom document. <documentElement> is the root ElementTree element, when there is one."""
+    def __init__(self, writeContent, documentElement=None):
+        self._writeContent, self.documentElement = writeContent, documentElement
+
+    def writexml(self, outputFile, indent="", addindent="", newl="", encoding=None):
+        writer = XMLStreamWriter(outputFile, addindent=addindent, newl=newl, encoding=encoding)
+        writer.startDocument()
+        self._writeContent(writer)
+
+    def toprettyxml(self, indent="\t", newl="\n", encoding=None):
+        outputFile = io.StringIO()
+        self.writexml(outputFile, addindent=indent, newl=newl, encoding=encoding)
+        if encoding is None:
+            return outputFile.getvalue()
+        return outputFile.getvalue().encode(encoding)
+
+    def unlink(self):
+        self._writeContent, self.documentElement = None, None